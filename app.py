@@ -4,6 +4,7 @@ DTW Comparison Tool - Entry Point
 This is the main entry point for the Streamlit application.
 All business logic has been modularized into the src/ folder.
 """
+import os
 import streamlit as st
 from src.config import PAGE_TITLE, PAGE_LAYOUT, PAGES
 from src.pages import home, dtw_comparison, batch_comparison, single_file_comparison
@@ -16,108 +17,19 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Stylesheet lives next to the code so it is found regardless of the working directory
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src", "assets", "app.css")
+
+
+@st.cache_data(show_spinner=False)
+def _load_css():
+    """Read the custom stylesheet once per process."""
+    with open(CSS_PATH, encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
+
 # Custom CSS for better UI
-st.markdown("""
-<style>
-    /* Main header styling */
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: 700;
-        color: #1f77b4;
-        margin-bottom: 0.5rem;
-    }
-    
-    /* Sidebar styling - theme-aware */
-    [data-testid="stSidebar"] {
-        background-color: var(--secondary-background-color);
-    }
-    
-    /* Sidebar text elements - ensure readability in both modes */
-    [data-testid="stSidebar"] * {
-        color: var(--text-color);
-    }
-    
-    /* Sidebar markdown headings */
-    [data-testid="stSidebar"] h3 {
-        color: var(--text-color) !important;
-    }
-    
-    /* Sidebar links */
-    [data-testid="stSidebar"] a {
-        color: #1f77b4;
-    }
-    
-    [data-testid="stSidebar"] a:hover {
-        color: #1557a0;
-    }
-    
-    /* Navigation button styling - theme-aware */
-    .nav-button {
-        width: 100%;
-        padding: 0.75rem;
-        margin: 0.5rem 0;
-        border-radius: 0.5rem;
-        border: 2px solid rgba(128, 128, 128, 0.3);
-        background-color: var(--secondary-background-color);
-        cursor: pointer;
-        transition: all 0.3s ease;
-        text-align: left;
-        font-size: 1rem;
-        color: var(--text-color);
-    }
-    
-    .nav-button:hover {
-        border-color: #1f77b4;
-        background-color: var(--background-color);
-        transform: translateX(5px);
-    }
-    
-    .nav-button.active {
-        border-color: #1f77b4;
-        background-color: #1f77b4;
-        color: white !important;
-        font-weight: 600;
-    }
-    
-    /* Info box styling - theme-aware */
-    .info-box {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        background-color: rgba(31, 119, 180, 0.1);
-        border-left: 4px solid #1f77b4;
-        margin: 1rem 0;
-    }
-    
-    /* Step header styling */
-    .step-header {
-        color: #1f77b4;
-        font-weight: 600;
-        font-size: 1.3rem;
-        margin-top: 1.5rem;
-        margin-bottom: 1rem;
-    }
-    
-    /* Hide default streamlit header */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    
-    /* Button styling */
-    .stButton>button {
-        background-color: #1f77b4;
-        color: white;
-        font-weight: 600;
-        border-radius: 0.5rem;
-        padding: 0.5rem 2rem;
-        border: none;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton>button:hover {
-        background-color: #1557a0;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-    }
-</style>
-""", unsafe_allow_html=True)
+st.markdown(_load_css(), unsafe_allow_html=True)
 
 # Sidebar navigation with selectbox (more professional than radio)
 with st.sidebar:
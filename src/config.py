@@ -15,5 +15,11 @@ PAGES = [
 # Outlier removal settings
 IQR_MULTIPLIER = 1.5
 
+# DTW settings: default Sakoe-Chiba band width (% of series length, 100 = unconstrained)
+DTW_BAND_PCT = 10
+
+# Upper bound on warping-path DP matrices held at once by the single-file page (bytes)
+PATH_MEMORY_BYTES = 1024 ** 3
+
 # File type support
 SUPPORTED_FILE_TYPES = ["csv", "xlsx"]
@@ -3,17 +3,147 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import os
-import itertools
 import io
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait
+import matplotlib.pyplot as plt
+from src.config import DTW_BAND_PCT
 from src.utils.file_io import read_file_from_path
 from src.utils.preprocessing import (
     add_datetime,
     remove_outliers_iqr_multicol,
     normalize_multiple_arrays,
-    align_lengths
+    pack_series
 )
 from src.utils.dtw import dtw_distance_multivariate
-from src.utils.visualization import plot_heatmap, compute_ranking
+from src.utils.dtw_gpu import gpu_available, batch_dtw_gpu
+from src.utils.dtw_numba import NUMBA_AVAILABLE, band_radius, get_batch_kernel
+from src.utils.visualization import plot_heatmap, compute_ranking_condensed, condensed_to_square
+
+
+@st.cache_data(show_spinner=False)
+def _load_file(file_path, mtime):
+    """Read a file once per (path, modification time) pair."""
+    return read_file_from_path(file_path)
+
+
+@st.cache_data(show_spinner=False)
+def _common_columns(path_mtimes):
+    """Return the columns shared by all files, in the first file's column order."""
+    columns = [_load_file(path, mtime).columns for path, mtime in path_mtimes]
+    common = set(columns[0]).intersection(*columns[1:])
+    # Keep a stable order so the selectbox options do not reshuffle on rerun
+    return tuple(c for c in columns[0] if c in common)
+
+
+@st.cache_data(show_spinner=False)
+def _preprocess_file(file_path, mtime, cols, date_col, time_col):
+    """Combine datetime, remove outliers and return the selected columns as an array."""
+    df = _load_file(file_path, mtime)
+    df = add_datetime(df, date_col, time_col)
+    df_clean = remove_outliers_iqr_multicol(df, list(cols))
+    # One conversion straight to a contiguous float64 block (no copy if the
+    # columns already are). Univariate runs are never normalized, so raw
+    # values keep full precision here; pack_series() centers them before
+    # the single float32 cast for the DTW kernels.
+    return np.ascontiguousarray(df_clean[list(cols)].to_numpy(dtype=np.float64, copy=False))
+
+
+@st.cache_data(show_spinner=False)
+def _heatmap_png(matrix_bytes, shape, labels):
+    """Render the distance heatmap to PNG once per distinct matrix."""
+    dist_matrix = np.frombuffer(matrix_bytes).reshape(shape)
+    fig = plot_heatmap(dist_matrix, list(labels), "DTW Distance Matrix")
+    img_buffer = io.BytesIO()
+    fig.savefig(img_buffer, format='png', bbox_inches='tight', dpi=150)
+    plt.close(fig)
+    return img_buffer.getvalue()
+
+
+# Inputs and shared outputs for worker processes (set by _init_worker)
+_series = None
+_lengths = None
+_band_pct = 100
+_pair_i = None
+_pair_j = None
+_out = None
+_counter = None
+
+
+def _init_worker(series, lengths, band_pct, pair_i, pair_j, shared_out, counter):
+    """Stash the packed series and shared result buffers once per worker."""
+    global _series, _lengths, _band_pct, _pair_i, _pair_j, _out, _counter
+    _series, _lengths, _band_pct = series, lengths, band_pct
+    _pair_i, _pair_j = pair_i, pair_j
+    _out = np.frombuffer(shared_out, dtype=np.float64)
+    _counter = counter
+
+
+def _dtw_pairs(start, stop):
+    """Compute pairs start..stop-1 in a worker, writing into the shared condensed array."""
+    for p in range(start, stop):
+        i, j = _pair_i[p], _pair_j[p]
+        # align_lengths only truncates, so slice views directly instead of
+        # re-aligning every series once per pair
+        min_len = min(_lengths[i], _lengths[j])
+        if min_len == 0:
+            _out[p] = np.nan
+        else:
+            _out[p] = dtw_distance_multivariate(
+                _series[i, :min_len], _series[j, :min_len],
+                window=band_radius(min_len, _band_pct)
+            )
+        with _counter.get_lock():
+            _counter.value += 1
+
+
+def _pairwise_distances(series, lengths, pair_i, pair_j, band_pct, out, use_gpu=False):
+    """
+    Fill out[p] with the DTW distance of pair p, yielding the number of pairs done.
+    
+    Each pair owns one slot of the condensed output, so no path needs
+    coordination beyond a progress count.
+    """
+    total = len(pair_i)
+    if use_gpu:
+        out[:] = batch_dtw_gpu(series, lengths, pair_i, pair_j, band_pct)
+        yield total
+        return
+    
+    if NUMBA_AVAILABLE:
+        # Compiled kernel runs pairs in parallel threads; call it in chunks
+        # so the progress bar still advances
+        batch_dtw = get_batch_kernel(series.shape[2])
+        step = max(os.cpu_count() or 1, total // 20)
+        for start in range(0, total, step):
+            chunk = slice(start, start + step)
+            batch_dtw(series, lengths, pair_i[chunk], pair_j[chunk], float(band_pct), out[chunk])
+            yield min(start + step, total)
+        return
+    
+    # Pairs are independent, so spread them across worker processes. Workers
+    # write straight into shared memory and bump a shared counter; only the
+    # count crosses back to this process while they run.
+    n_workers = os.cpu_count() or 1
+    chunksize = max(1, total // (8 * n_workers))
+    shared_out = mp.RawArray('d', total)
+    counter = mp.Value('i', 0)
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_worker,
+        initargs=(series, lengths, band_pct, pair_i, pair_j, shared_out, counter)
+    ) as executor:
+        futures = [
+            executor.submit(_dtw_pairs, start, min(start + chunksize, total))
+            for start in range(0, total, chunksize)
+        ]
+        while not all(f.done() for f in futures):
+            wait(futures, timeout=0.2)
+            yield counter.value
+        for f in futures:
+            f.result()  # Re-raise any worker error
+    out[:] = np.frombuffer(shared_out, dtype=np.float64)
+    yield total
 
 
 def render():
@@ -33,8 +163,12 @@ def render():
     )
     
     if folder_path and os.path.isdir(folder_path):
-        # List all CSV/Excel files
-        files = [f for f in os.listdir(folder_path) if f.endswith(('.csv', '.xlsx'))]
+        # List all CSV/Excel files; DirEntry caches stat info for the cache keys
+        with os.scandir(folder_path) as it:
+            entries = [e for e in it if e.is_file() and e.name.endswith(('.csv', '.xlsx'))]
+        files = [e.name for e in entries]
+        paths = {e.name: e.path for e in entries}
+        mtimes = {e.name: e.stat().st_mtime for e in entries}
         
         if len(files) < 2:
             st.error("❌ The folder must contain at least two CSV or Excel files.")
@@ -46,14 +180,10 @@ def render():
             
             # --- 2. Read all files into dataframes
             with st.spinner('📖 Reading files...'):
-                dfs = {}
-                for fname in files:
-                    fpath = os.path.join(folder_path, fname)
-                    dfs[fname] = read_file_from_path(fpath)
+                dfs = {fname: _load_file(paths[fname], mtimes[fname]) for fname in files}
             
             # --- 3. Select date/time columns (must exist in all files)
-            all_columns = [set(df.columns) for df in dfs.values()]
-            common_cols = set.intersection(*all_columns)
+            common_cols = _common_columns(tuple((paths[f], mtimes[f]) for f in files))
             
             if not common_cols:
                 st.error("❌ No common columns found across all files. Please ensure all files have matching column names.")
@@ -64,7 +194,7 @@ def render():
                 
                 col1, col2 = st.columns(2)
                 with col1:
-                    date_col = st.selectbox("📅 Date column", list(common_cols), key="batch_date")
+                    date_col = st.selectbox("📅 Date column", common_cols, key="batch_date")
                 with col2:
                     time_options = ["None"] + list(common_cols)
                     time_col = st.selectbox("🕐 Time column (optional)", time_options, key="batch_time")
@@ -89,6 +219,20 @@ def render():
                         st.markdown("---")
                 
                 st.markdown("---")
+                band_pct = st.slider(
+                    "📐 DTW band width (% of length)",
+                    min_value=1,
+                    max_value=100,
+                    value=DTW_BAND_PCT,
+                    help="Sakoe-Chiba constraint: the warping path may deviate at most this far from the diagonal. "
+                         "Smaller bands are faster; 100% means unconstrained DTW."
+                )
+                use_gpu = st.checkbox(
+                    "⚡ Use GPU acceleration",
+                    value=False,
+                    disabled=not gpu_available(),
+                    help="Compute all pairs together on a CUDA GPU (requires PyTorch). Best for many files."
+                )
                 run = st.button("🚀 Run Batch DTW Comparison", type="primary", use_container_width=True)
                 
                 if run:
@@ -105,14 +249,13 @@ def render():
                         st.markdown("## 🔄 Processing Data")
                         
                         with st.spinner('Preprocessing files (outlier removal, normalization)...'):
-                            processed = {}
-                            for fname in files:
-                                df = dfs[fname]
-                                cols = selected_columns[fname]
-                                df = add_datetime(df, date_col, time_col)
-                                df_clean = remove_outliers_iqr_multicol(df, cols)
-                                arr = df_clean[cols].values
-                                processed[fname] = arr
+                            processed = {
+                                fname: _preprocess_file(
+                                    paths[fname], mtimes[fname],
+                                    tuple(selected_columns[fname]), date_col, time_col
+                                )
+                                for fname in files
+                            }
                         
                         # --- 6. Normalize all arrays together if multivariate
                         n_cols = list(n_cols_set)[0]
@@ -125,40 +268,38 @@ def render():
                         # --- 7. Compute pairwise DTW distances with progress bar
                         st.markdown("### 🧮 Computing Pairwise DTW Distances")
                         
-                        results = []
-                        dist_matrix = np.zeros((len(files), len(files)))
-                        pairs = list(itertools.combinations(range(len(files)), 2))
+                        # Upper-triangle index arrays, in the same order as itertools.combinations
+                        pair_i, pair_j = np.triu_indices(len(files), k=1)
+                        condensed = np.empty(len(pair_i))
                         
                         progress_bar = st.progress(0)
                         status_text = st.empty()
-                        total = len(pairs)
+                        total = len(pair_i)
+                        # Each update is a browser round-trip; advance in ~1% steps
+                        update_every = max(1, total // 100)
+                        last_shown = 0
                         
-                        for idx, (i, j) in enumerate(pairs):
-                            f1, f2 = files[i], files[j]
-                            x, y = processed[f1], processed[f2]
-                            
-                            min_len = min(len(x), len(y))
-                            if min_len == 0:
-                                dist = np.nan
-                            else:
-                                x_, y_ = align_lengths(x, y)
-                                dist = dtw_distance_multivariate(x_, y_)
-                            
-                            results.append({'File 1': f1, 'File 2': f2, 'DTW Distance': dist})
-                            dist_matrix[i, j] = dist
-                            dist_matrix[j, i] = dist
-                            
+                        # Single contiguous float32 block of shape (n_files, max_len, n_cols),
+                        # centered first so raw (univariate) values keep their precision
+                        # on every backend (compiled, GPU and process pool)
+                        series, lengths = pack_series([processed[f] for f in files], center=True)
+                        
+                        for done in _pairwise_distances(series, lengths, pair_i, pair_j, band_pct, condensed, use_gpu):
                             # Update progress bar
-                            progress = (idx + 1) / total
-                            progress_bar.progress(progress)
-                            status_text.text(f"📊 Comparing: `{f1}` vs `{f2}` ({idx + 1}/{total})")
+                            if done - last_shown >= update_every or (done == total and last_shown < total):
+                                last_shown = done
+                                progress_bar.progress(done / total)
+                                if done:
+                                    f1, f2 = files[pair_i[done - 1]], files[pair_j[done - 1]]
+                                    status_text.text(f"📊 Comparing: `{f1}` vs `{f2}` ({done}/{total})")
                         
                         progress_bar.empty()
                         status_text.empty()
                         st.success(f"✅ Completed {total} pairwise comparisons!")
                         
-                        # --- 8. Compute ranking
-                        ranking = compute_ranking(dist_matrix, files)
+                        # --- 8. Compute ranking (full matrix is only needed for the heatmap)
+                        ranking = compute_ranking_condensed(condensed, pair_i, pair_j, files)
+                        dist_matrix = condensed_to_square(condensed, pair_i, pair_j, len(files))
                         
                         # --- 9. Display results
                         st.markdown("---")
@@ -170,7 +311,12 @@ def render():
                         with tab1:
                             st.markdown("### Pairwise DTW Distances")
                             st.caption("All pairwise comparisons between files")
-                            pairwise_df = pd.DataFrame(results)
+                            file_names = np.array(files, dtype=object)
+                            pairwise_df = pd.DataFrame({
+                                'File 1': file_names[pair_i],
+                                'File 2': file_names[pair_j],
+                                'DTW Distance': condensed
+                            })
                             st.dataframe(pairwise_df, use_container_width=True, height=400)
                             
                             # Download Pairwise DTW Distances as Excel
@@ -186,6 +332,15 @@ def render():
                                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                                 use_container_width=True
                             )
+                            
+                            # CSV is much faster to produce than xlsx for large pair tables
+                            st.download_button(
+                                label="📥 Download Pairwise Distances (CSV)",
+                                data=pairwise_df.to_csv(index=False).encode('utf-8'),
+                                file_name="pairwise_dtw_distances.csv",
+                                mime="text/csv",
+                                use_container_width=True
+                            )
                         
                         with tab2:
                             st.markdown("### File Ranking by Dissimilarity")
@@ -220,17 +375,13 @@ def render():
                             st.markdown("### Distance Matrix Heatmap")
                             st.caption("Visual representation of pairwise DTW distances")
                             
-                            fig = plot_heatmap(dist_matrix, files, "DTW Distance Matrix")
-                            st.pyplot(fig)
-                            
-                            # Download Heatmap as PNG
-                            img_buffer = io.BytesIO()
-                            fig.savefig(img_buffer, format='png', bbox_inches='tight', dpi=300)
-                            img_buffer.seek(0)
+                            # Rendered once; the same PNG is shown and offered for download
+                            heatmap_png = _heatmap_png(dist_matrix.tobytes(), dist_matrix.shape, tuple(files))
+                            st.image(heatmap_png)
                             
                             st.download_button(
                                 label="📥 Download Heatmap (PNG)",
-                                data=img_buffer,
+                                data=heatmap_png,
                                 file_name="dtw_heatmap.png",
                                 mime="image/png",
                                 use_container_width=True
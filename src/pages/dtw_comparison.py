@@ -1,5 +1,8 @@
 """DTW Comparison page - compare two uploaded files"""
+import io
+import numpy as np
 import streamlit as st
+from src.config import DTW_BAND_PCT
 from src.utils.file_io import read_file
 from src.utils.preprocessing import (
     add_datetime, 
@@ -7,10 +10,68 @@ from src.utils.preprocessing import (
     normalize_data,
     align_lengths
 )
-from src.utils.dtw import dtw_distance_multivariate
+from src.utils.dtw import dtw_distance, dtw_distance_multivariate
+from src.utils.dtw_numba import band_radius
 from src.utils.visualization import plot_time_series_comparison
 
 
+@st.cache_data(show_spinner=False)
+def _read_upload(file_bytes, name):
+    """Parse an uploaded file once per distinct content instead of on every rerun."""
+    buffer = io.BytesIO(file_bytes)
+    buffer.name = name  # read_file picks the parser from the extension
+    return read_file(buffer)
+
+
+@st.cache_data(show_spinner=False)
+def _compute(file1_bytes, name1, date_col1, time_col1, cols1,
+             file2_bytes, name2, date_col2, time_col2, cols2, band_pct):
+    """
+    Run the preprocessing pipeline and DTW once per distinct set of inputs.
+    
+    Returns:
+        tuple: (x, y, df1_clean, df2_clean, distance)
+    """
+    cols1, cols2 = list(cols1), list(cols2)
+    df1 = _read_upload(file1_bytes, name1)
+    df2 = _read_upload(file2_bytes, name2)
+    
+    # --- Combine date and time columns ---
+    df1 = add_datetime(df1, date_col1, time_col1)
+    df2 = add_datetime(df2, date_col2, time_col2)
+    
+    # Only keep selected columns + Datetime
+    df1 = df1[["Datetime"] + cols1]
+    df2 = df2[["Datetime"] + cols2]
+    
+    # Remove outliers
+    df1_clean = remove_outliers_iqr_multicol(df1, cols1)
+    df2_clean = remove_outliers_iqr_multicol(df2, cols2)
+    
+    # Extract selected columns as contiguous float64 arrays in one conversion
+    # (no copy if they already are). Raw values keep full precision; only
+    # normalized multivariate data is narrowed to float32 below.
+    x = np.ascontiguousarray(df1_clean[cols1].to_numpy(dtype=np.float64, copy=False))
+    y = np.ascontiguousarray(df2_clean[cols2].to_numpy(dtype=np.float64, copy=False))
+    
+    # Align lengths
+    x, y = align_lengths(x, y)
+    
+    # Compute DTW distance within the Sakoe-Chiba band
+    window = band_radius(len(x), band_pct)
+    if len(cols1) == 1:
+        # Univariate: raw float64 values (never normalized, so float32 would
+        # round them) and scalar |a - b| cost, no per-cell vector norm
+        distance = dtw_distance(x[:, 0], y[:, 0], window=window)
+    else:
+        # Normalize if multivariate (statistics accumulate in float64), then
+        # narrow the O(1) normalized values to float32 for the DP
+        x, y = normalize_data(x, y)
+        x, y = x.astype(np.float32), y.astype(np.float32)
+        distance = dtw_distance_multivariate(x, y, window=window)
+    return x, y, df1_clean, df2_clean, distance
+
+
 def render():
     """Render the DTW comparison page"""
     st.markdown('<h1 class="main-header">📝 DTW Comparison</h1>', unsafe_allow_html=True)
@@ -27,25 +88,29 @@ def render():
         file2 = st.file_uploader("📄 Second Dataset", type=["csv", "xlsx"], key="file2", help="Upload your second time series file")
     
     if file1 and file2:
-        df1 = read_file(file1)
-        df2 = read_file(file2)
+        df1 = _read_upload(file1.getvalue(), file1.name)
+        df2 = _read_upload(file2.getvalue(), file2.name)
         
         st.success(f"✅ Files loaded successfully! ({len(df1)} rows in File 1, {len(df2)} rows in File 2)")
         
+        # Widget option lists, built once per rerun
+        columns1 = df1.columns.tolist()
+        columns2 = df2.columns.tolist()
+        
         st.markdown("---")
         st.markdown('<div class="step-header">📅 Step 2: Configure Date/Time Columns</div>', unsafe_allow_html=True)
         
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("**First Dataset**")
-            date_col1 = st.selectbox("📅 Date column", df1.columns, index=0, key="date1")
-            time_options1 = ["None"] + list(df1.columns)
+            date_col1 = st.selectbox("📅 Date column", columns1, index=0, key="date1")
+            time_options1 = ["None"] + columns1
             time_col1 = st.selectbox("🕐 Time column (optional)", time_options1, index=0, key="time1")
         
         with col2:
             st.markdown("**Second Dataset**")
-            date_col2 = st.selectbox("📅 Date column", df2.columns, index=0, key="date2")
-            time_options2 = ["None"] + list(df2.columns)
+            date_col2 = st.selectbox("📅 Date column", columns2, index=0, key="date2")
+            time_options2 = ["None"] + columns2
             time_col2 = st.selectbox("🕐 Time column (optional)", time_options2, index=0, key="time2")
         
         # --- Select columns to compare ---
@@ -56,12 +121,21 @@ def render():
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("**First Dataset Columns**")
-            cols1 = st.multiselect("Select columns", list(df1.columns), key="cols1", help="Choose numerical columns to compare")
+            cols1 = st.multiselect("Select columns", columns1, key="cols1", help="Choose numerical columns to compare")
         with col2:
             st.markdown("**Second Dataset Columns**")
-            cols2 = st.multiselect("Select columns", list(df2.columns), key="cols2", help="Choose numerical columns to compare")
+            cols2 = st.multiselect("Select columns", columns2, key="cols2", help="Choose numerical columns to compare")
         
         st.markdown("---")
+        band_pct = st.slider(
+            "📐 DTW band width (% of length)",
+            min_value=1,
+            max_value=100,
+            value=DTW_BAND_PCT,
+            key="band_pct",
+            help="Sakoe-Chiba constraint: the warping path may deviate at most this far from the diagonal. "
+                 "Smaller bands are faster; 100% means unconstrained DTW."
+        )
         run = st.button("🚀 Run DTW Comparison", type="primary", use_container_width=True)
         
         if run:
@@ -71,31 +145,12 @@ def render():
                 st.error("❌ Please select the same number of columns from each file for comparison.")
             else:
                 with st.spinner('🔄 Processing data and computing DTW distance...'):
-                    # --- Combine date and time columns ---
-                    df1 = add_datetime(df1, date_col1, time_col1)
-                    df2 = add_datetime(df2, date_col2, time_col2)
-                    
-                    # Only keep selected columns + Datetime
-                    df1 = df1[["Datetime"] + cols1]
-                    df2 = df2[["Datetime"] + cols2]
-                    
-                    # Remove outliers
-                    df1_clean = remove_outliers_iqr_multicol(df1, cols1)
-                    df2_clean = remove_outliers_iqr_multicol(df2, cols2)
-                    
-                    # Extract selected columns as numpy arrays
-                    x = df1_clean[cols1].values
-                    y = df2_clean[cols2].values
-                    
-                    # Align lengths
-                    x, y = align_lengths(x, y)
-                    
-                    # Normalize if multivariate
-                    if len(cols1) > 1:
-                        x, y = normalize_data(x, y)
-                    
-                    # Compute DTW distance
-                    distance = dtw_distance_multivariate(x, y)
+                    # Cached on the inputs, so re-running an unchanged comparison is instant
+                    x, y, df1_clean, df2_clean, distance = _compute(
+                        file1.getvalue(), file1.name, date_col1, time_col1, tuple(cols1),
+                        file2.getvalue(), file2.name, date_col2, time_col2, tuple(cols2),
+                        band_pct
+                    )
                 
                 # Display results
                 st.markdown("---")
@@ -2,15 +2,177 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import itertools
 import io
+import os
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
+from src.config import DTW_BAND_PCT, PATH_MEMORY_BYTES
 from src.utils.file_io import read_file
-from src.utils.preprocessing import add_datetime, remove_outliers_iqr
-from src.utils.dtw import dtw_distance, dtw_distance_with_path, analyze_local_divergence
+from src.utils.preprocessing import add_datetime, remove_outliers_iqr_columns
+from src.utils.dtw import dtw_distance, dtw_distance_with_path, analyze_local_divergence, path_matrix_bytes
+from src.utils.dtw_numba import band_radius
 from src.utils.visualization import plot_single_comparison, plot_heatmap, compute_ranking, plot_divergence_analysis
 
 
+@st.cache_data(show_spinner=False)
+def _read_upload(file_bytes, name):
+    """Parse an uploaded file once per distinct content instead of on every rerun."""
+    buffer = io.BytesIO(file_bytes)
+    buffer.name = name  # read_file picks the parser from the extension
+    return read_file(buffer)
+
+
+@st.cache_data(show_spinner=False)
+def _numeric_columns(file_bytes, name):
+    """List an upload's numeric columns once per distinct content."""
+    return _read_upload(file_bytes, name).select_dtypes(include=[np.number]).columns.tolist()
+
+
+def _figure_png(key, make_figure, dpi):
+    """Render a figure to PNG once per analysis run and reuse it on later reruns."""
+    pngs = st.session_state.setdefault('figure_pngs', {})
+    if key not in pngs:
+        fig = make_figure()
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+        pngs[key] = buf.getvalue()
+    return pngs[key]
+
+
+@st.cache_resource
+def _executor():
+    """Thread pool shared across reruns for the per-pair analysis."""
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+
+def _pair_path(s1_norm, s2_norm, window, identical):
+    """Compute the DTW distance and warping path of one normalized pair."""
+    if identical:
+        # Identical series align on the zero-cost diagonal, as the DP would return
+        return 0.0, np.repeat(np.arange(len(s1_norm))[:, None], 2, axis=1)
+    if not len(s1_norm):
+        return np.nan, np.empty((0, 2), dtype=np.int64)
+    # The (banded) DP matrix is allocated per call and freed on return, so
+    # idle pool threads hold no memory between runs
+    return dtw_distance_with_path(s1_norm, s2_norm, window=window)
+
+
+# Each entry holds every pair's series and path; keep only a few recent settings
+@st.cache_data(show_spinner="🔄 Computing DTW distances and warping paths...", max_entries=4)
+def _align_pairs(file_bytes, name, date_col, time_col, selected_cols, band_pct):
+    """
+    Clean, normalize and DTW-align every pair of selected columns.
+    
+    Cached on the inputs, so re-running with different divergence settings
+    reuses the distances and warping paths.
+    
+    Args:
+        file_bytes: Raw bytes of the uploaded file
+        name: Uploaded file name (selects the parser)
+        date_col, time_col: Date/time column names, or "None"
+        selected_cols: Tuple of columns to compare
+        band_pct: Sakoe-Chiba band width as a percentage of the pair length
+    
+    Returns:
+        tuple: (dist_matrix, aligned, band_limited) where aligned holds one
+        (col1, col2, index, s1_norm, s2_norm, distance, path) tuple per pair
+        and band_limited counts paths that touch the band edge
+    """
+    df = _read_upload(file_bytes, name)
+    if date_col != "None":
+        # add_datetime() sorts by time; project first so only the columns
+        # used here are reordered, not the whole upload
+        used = list(dict.fromkeys([*selected_cols, date_col] + ([time_col] if time_col != "None" else [])))
+        df = add_datetime(df[used], date_col, time_col)
+    
+    n = len(selected_cols)
+    dist_matrix = np.zeros((n, n))
+    
+    # Outlier removal depends only on the column, so clean each one once
+    cleaned = remove_outliers_iqr_columns(df, selected_cols)
+    # Plain arrays for the pair loop; the index is only needed for timestamps
+    values = {c: cleaned[c].to_numpy(dtype=np.float64) for c in selected_cols}
+    
+    # Upper-triangle index arrays, in the same order as itertools.combinations
+    pair_i, pair_j = np.triu_indices(n, k=1)
+    
+    # Running sums of each column give any pair's pooled mean/std
+    # for its common prefix in O(1). A shared offset keeps the
+    # sum-of-squares formula from cancelling on large values.
+    offset = np.mean([v.mean() for v in values.values() if len(v)] or [0.0])
+    shifted = {c: v - offset for c, v in values.items()}
+    csum = {c: np.cumsum(v) for c, v in shifted.items()}
+    csumsq = {c: np.cumsum(v * v) for c, v in shifted.items()}
+    
+    # Normalize every pair (cheap, O(1) statistics)
+    prepared = []
+    for i, j in zip(pair_i, pair_j):
+        col1, col2 = selected_cols[i], selected_cols[j]
+        # Align lengths (views, no copies)
+        min_len = min(len(values[col1]), len(values[col2]))
+        s1_aligned = values[col1][:min_len]
+        s2_aligned = values[col2][:min_len]
+        
+        # Normalize with the pair's pooled statistics
+        if min_len:
+            count = 2 * min_len
+            shifted_mean = (csum[col1][min_len - 1] + csum[col2][min_len - 1]) / count
+            var = (csumsq[col1][min_len - 1] + csumsq[col2][min_len - 1]) / count - shifted_mean ** 2
+            mean = shifted_mean + offset
+            std = np.sqrt(max(var, 0.0))
+        else:
+            mean = std = np.nan
+        std = std if std != 0 else 1
+        # Normalized values are O(1), so float32 halves the memory traffic
+        # of the path DP at negligible rounding cost
+        s1_norm = ((s1_aligned - mean) / std).astype(np.float32)
+        s2_norm = ((s2_aligned - mean) / std).astype(np.float32)
+        
+        # Identical columns (matching prefix sums, then an exact check)
+        # skip the path DP entirely
+        identical = bool(
+            min_len
+            and csum[col1][min_len - 1] == csum[col2][min_len - 1]
+            and csumsq[col1][min_len - 1] == csumsq[col2][min_len - 1]
+            and np.array_equal(s1_aligned, s2_aligned)
+        )
+        prepared.append((col1, col2, min_len, s1_norm, s2_norm, identical))
+    
+    # Distances and warping paths come from the same DP, so the distance
+    # shown next to a path is the cost of that path. Pairs are independent,
+    # so they run on a thread pool.
+    # Threads rather than processes: forking after the compiled
+    # kernels have started their thread pool is unsafe.
+    windows = [band_radius(min_len, band_pct) for _, _, min_len, *_ in prepared]
+    tasks = [(s1_norm, s2_norm, window, identical)
+             for (_, _, _, s1_norm, s2_norm, identical), window in zip(prepared, windows)]
+    # Every running path holds one DP matrix, so only as many pairs as fit
+    # the memory budget run at once (long series go one at a time)
+    largest = max((path_matrix_bytes(min_len, min_len, window)
+                   for (_, _, min_len, *_, identical), window in zip(prepared, windows)
+                   if not identical), default=0)
+    group = max(1, min(os.cpu_count() or 1, PATH_MEMORY_BYTES // max(largest, 1)))
+    results = []
+    for start in range(0, len(tasks), group):
+        results.extend(_executor().map(lambda args: _pair_path(*args), tasks[start:start + group]))
+    
+    aligned = []
+    band_limited = 0
+    for (col1, col2, min_len, s1_norm, s2_norm, _), (dist, path), window in zip(prepared, results, windows):
+        if len(path) and window < min_len - 1 and np.abs(path[:, 0] - path[:, 1]).max() >= window:
+            band_limited += 1
+        # Paths are kept for every pair in the cache and session state; int32
+        # indices halve their footprint (series are far below 2**31 points)
+        aligned.append((col1, col2, cleaned[col1].index[:min_len], s1_norm, s2_norm, dist, path.astype(np.int32)))
+    
+    # Fill both triangles of the symmetric matrix at once
+    pair_dists = np.array([dist for dist, _ in results], dtype=np.float64)
+    dist_matrix[pair_i, pair_j] = pair_dists
+    dist_matrix[pair_j, pair_i] = pair_dists
+    return dist_matrix, aligned, band_limited
+
+
 def render():
     """Render the single file pairwise comparison page"""
     st.markdown('<h1 class="main-header">📊 Single File Column Comparison</h1>', unsafe_allow_html=True)
@@ -33,7 +195,7 @@ def render():
             st.session_state.last_uploaded_file = uploaded_file.name
         
         # Read file
-        df = read_file(uploaded_file)
+        df = _read_upload(uploaded_file.getvalue(), uploaded_file.name)
         
         st.success(f"✅ File loaded successfully! ({len(df)} rows, {len(df.columns)} columns)")
         
@@ -46,17 +208,20 @@ def render():
         st.markdown('<div class="step-header">📅 Step 2: Configure Date/Time Columns (Optional)</div>', unsafe_allow_html=True)
         st.info("💡 If your data has temporal information, select the date/time columns for proper alignment.")
         
+        # Shared by both selectboxes, built once per rerun
+        column_options = ["None"] + df.columns.tolist()
+        
         col1, col2 = st.columns(2)
         with col1:
-            date_col = st.selectbox("📅 Date column", ["None"] + list(df.columns), index=0, key="single_date")
+            date_col = st.selectbox("📅 Date column", column_options, index=0, key="single_date")
         with col2:
-            time_col = st.selectbox("🕐 Time column", ["None"] + list(df.columns), index=0, key="single_time")
+            time_col = st.selectbox("🕐 Time column", column_options, index=0, key="single_time")
         
         st.markdown("---")
         
         # 3. Select columns to compare
         st.markdown('<div class="step-header">🎯 Step 3: Select Columns to Compare</div>', unsafe_allow_html=True)
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_cols = _numeric_columns(uploaded_file.getvalue(), uploaded_file.name)
         
         if not numeric_cols:
             st.error("❌ No numeric columns found for comparison. Please upload a file with numerical data.")
@@ -76,7 +241,7 @@ def render():
                 st.session_state.last_selected_cols = selected_cols
             
             if len(selected_cols) >= 2:
-                num_comparisons = len(list(itertools.combinations(selected_cols, 2)))
+                num_comparisons = len(selected_cols) * (len(selected_cols) - 1) // 2
                 st.caption(f"This will perform {num_comparisons} pairwise comparisons")
             
             if len(selected_cols) < 2:
@@ -105,6 +270,15 @@ def render():
                         value=75,
                         help="Higher percentile = only flag extreme divergences (less sensitive)"
                     )
+                band_pct = st.slider(
+                    "📐 DTW band width (% of length)",
+                    min_value=1,
+                    max_value=100,
+                    value=DTW_BAND_PCT,
+                    key="single_band_pct",
+                    help="Sakoe-Chiba constraint: the warping path may deviate at most this far from the diagonal. "
+                         "Smaller bands are faster; 100% means unconstrained DTW."
+                )
                 
                 st.markdown("---")
                 
@@ -122,70 +296,41 @@ def render():
                             st.rerun()
                 
                 if run:
-                    # Add Datetime if needed
-                    if date_col != "None":
-                        df = add_datetime(df, date_col, time_col)
-                        df = df.sort_values('Datetime')
-                    
                     # Prepare results and distance matrix
                     st.markdown("---")
                     st.markdown("## 🔄 Processing Comparisons & Divergence Analysis")
                     
+                    # Distances and paths do not depend on the divergence settings,
+                    # so changing only those reuses the cached alignments
+                    dist_matrix, aligned, band_limited = _align_pairs(
+                        uploaded_file.getvalue(), uploaded_file.name,
+                        date_col, time_col, tuple(selected_cols), band_pct
+                    )
+                    
                     results = []
                     divergence_results = {}  # Store divergence data for all pairs
-                    pairs = list(itertools.combinations(selected_cols, 2))
-                    n = len(selected_cols)
-                    dist_matrix = np.zeros((n, n))
+                    pairs = [(col1, col2) for col1, col2, *_ in aligned]
                     
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     total = len(pairs)
+                    # Each update is a browser round-trip; refresh at most ~50 times
+                    update_every = max(1, total // 50)
                     
-                    # Container for individual comparisons
-                    comparisons_container = st.container()
-                    
-                    for idx, (col1, col2) in enumerate(pairs):
-                        status_text.text(f"📊 Comparing & analyzing divergence: `{col1}` vs `{col2}` ({idx + 1}/{total})")
-                        
-                        # Remove outliers independently
-                        s1 = remove_outliers_iqr(df[col1].dropna())
-                        s2 = remove_outliers_iqr(df[col2].dropna())
-
-                        # Align lengths
-                        min_len = min(len(s1), len(s2))
-                        s1_aligned = s1.iloc[:min_len]
-                        s2_aligned = s2.iloc[:min_len]
-                        
-                        # Create aligned dataframe for later use
-                        df_aligned = pd.DataFrame({
-                            col1: s1_aligned.values,
-                            col2: s2_aligned.values
-                        }, index=s1_aligned.index)
-                        
-                        # Normalize
-                        mean = np.mean(np.concatenate([s1_aligned.values, s2_aligned.values]))
-                        std = np.std(np.concatenate([s1_aligned.values, s2_aligned.values]))
-                        std = std if std != 0 else 1
-                        s1_norm = (s1_aligned.values - mean) / std
-                        s2_norm = (s2_aligned.values - mean) / std
-                        
-                        # DTW with path
-                        dist, path = dtw_distance_with_path(s1_norm.reshape(-1, 1), s2_norm.reshape(-1, 1))
-                        
-                        # Divergence analysis
+                    for done, (col1, col2, index, s1_norm, s2_norm, dist, path) in enumerate(aligned, 1):
                         divergence_scores, divergence_periods, threshold = analyze_local_divergence(
-                            s1_norm.reshape(-1, 1), s2_norm.reshape(-1, 1), 
-                            path, window_size, threshold_percentile
+                            s1_norm, s2_norm, path, window_size, threshold_percentile
                         )
                         
                         # Store divergence data
                         df_normalized = pd.DataFrame({
                             col1: s1_norm,
                             col2: s2_norm
-                        }, index=s1_aligned.index)
+                        }, index=index)
                         
                         divergence_results[f"{col1} vs {col2}"] = {
                             'df_normalized': df_normalized,
+                            'distance': dist,
                             'path': path,
                             'divergence_scores': divergence_scores,
                             'divergence_periods': divergence_periods,
@@ -200,18 +345,19 @@ def render():
                             "Divergence Periods": len(divergence_periods)
                         })
                         
-                        # Fill symmetric matrix
-                        i = selected_cols.index(col1)
-                        j = selected_cols.index(col2)
-                        dist_matrix[i, j] = dist
-                        dist_matrix[j, i] = dist
-                        
                         # Update progress
-                        progress_bar.progress((idx + 1) / total)
+                        if done % update_every == 0 or done == total:
+                            status_text.text(f"📊 Analyzing divergence: `{col1}` vs `{col2}` ({done}/{total})")
+                            progress_bar.progress(done / total)
                     
                     progress_bar.empty()
                     status_text.empty()
                     st.success(f"✅ Completed {total} pairwise comparisons with divergence analysis!")
+                    if band_limited:
+                        st.warning(
+                            f"⚠️ The warping path reached the edge of the {band_pct}% band for "
+                            f"{band_limited}/{total} pairs; a wider band may lower their distances."
+                        )
                     
                     # Store results in session state
                     st.session_state.results = results
@@ -219,6 +365,7 @@ def render():
                     st.session_state.dist_matrix = dist_matrix
                     st.session_state.selected_cols = selected_cols
                     st.session_state.pairs = pairs
+                    st.session_state.figure_pngs = {}  # Figures of a previous run are stale
                     st.session_state.analysis_complete = True
                 
                 # Display results (whether just computed or from session state)
@@ -337,9 +484,13 @@ def render():
                         st.markdown("### Distance Matrix Heatmap")
                         st.caption("Visual representation of pairwise DTW distances")
                         
-                        fig = plot_heatmap(dist_matrix, selected_cols, "DTW Distance Matrix")
-                        st.pyplot(fig, use_container_width=True)
-                        plt.close(fig)
+                        # Tabs all run on every rerun; draw the heatmap only once
+                        heatmap_png = _figure_png(
+                            'heatmap',
+                            lambda: plot_heatmap(dist_matrix, selected_cols, "DTW Distance Matrix"),
+                            dpi=150
+                        )
+                        st.image(heatmap_png)
                     
                     with tab5:
                         st.markdown("### Detailed Divergence Analysis")
@@ -359,7 +510,7 @@ def render():
                             # Display summary for this pair
                             col_info1, col_info2, col_info3 = st.columns(3)
                             with col_info1:
-                                st.metric("DTW Distance", f"{results_df[results_df['Column 1'] == col1]['DTW Distance'].values[0]:.3f}")
+                                st.metric("DTW Distance", f"{data['distance']:.3f}")
                             with col_info2:
                                 st.metric("Divergence Periods", data['num_periods'])
                             with col_info3:
@@ -397,39 +548,34 @@ def render():
                                     use_container_width=True
                                 )
                             
-                            # Create visualization
+                            # Create visualization (rendered once per pair, shown and downloaded as the same PNG)
                             st.markdown("#### Comprehensive Divergence Visualization")
-                            fig = plot_divergence_analysis(
-                                data['df_normalized'], 
-                                col1, 
-                                col2, 
-                                data['path'], 
-                                data['divergence_scores'], 
-                                data['divergence_periods'], 
-                                data['threshold']
+                            divergence_png = _figure_png(
+                                selected_pair,
+                                lambda: plot_divergence_analysis(
+                                    data['df_normalized'], 
+                                    col1, 
+                                    col2, 
+                                    data['path'], 
+                                    data['divergence_scores'], 
+                                    data['divergence_periods'], 
+                                    data['threshold']
+                                ),
+                                dpi=150
                             )
-                            
-                            # Display the figure
-                            st.pyplot(fig, use_container_width=True)
+                            st.image(divergence_png, use_container_width=True)
                             
                             # Export options for this pair
                             col_export1, col_export2 = st.columns(2)
                             with col_export1:
-                                # Create buffer for download (create new buffer to avoid conflicts)
-                                buf = io.BytesIO()
-                                fig.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-                                buf.seek(0)
                                 st.download_button(
                                     label="📊 Download Visualization (PNG)",
-                                    data=buf,
+                                    data=divergence_png,
                                     file_name=f"divergence_{col1}_vs_{col2}.png",
                                     mime="image/png",
                                     use_container_width=True
                                 )
                             
-                            # Close the figure to free memory and prevent display issues
-                            plt.close(fig)
-                            
                             with col_export2:
                                 if data['num_periods'] > 0:
                                     output = io.BytesIO()
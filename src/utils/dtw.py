@@ -1,62 +1,74 @@
 """Dynamic Time Warping (DTW) distance computation"""
 import numpy as np
+from src.utils.dtw_numba import dtw_band_path, dtw_band_path_1d, dtw_path, dtw_path_1d, dtw_rows, dtw_rows_1d, get_batch_kernel
+from src.utils.preprocessing import pack_series
 
 
-def dtw_distance_with_path(x, y):
+def _band_storage(m, window):
+    """Whether the cumulative matrix is stored as its band (narrower than a full row)."""
+    return 2 * window + 1 < m + 1
+
+
+def path_matrix_bytes(n, m, window=None):
+    """
+    Size of the cumulative matrix dtw_distance_with_path() allocates.
+    
+    Args:
+        n, m: Series lengths
+        window: Sakoe-Chiba band radius (default: None, unconstrained)
+    
+    Returns:
+        int: Bytes held while the path is computed
+    """
+    window = max(n, m) if window is None else max(window, abs(n - m))
+    width = 2 * window + 1 if _band_storage(m, window) else m + 1
+    return 8 * (n + 1) * width
+
+
+def dtw_distance_with_path(x, y, window=None, buf=None):
     """
     Compute DTW distance and return the optimal alignment path.
     
+    Without buf, a banded run stores only the band of the cumulative matrix,
+    (len(x) + 1, 2 * window + 1), when that is narrower than the full matrix.
+    
     Args:
         x, y: Input arrays (n_samples, n_features) or (n_samples,)
+        window: Sakoe-Chiba band radius; cells with |i - j| > window are
+            skipped (default: None, unconstrained)
+        buf: Optional scratch array of at least (len(x) + 1, len(y) + 1)
+            reused for the full cumulative matrix instead of allocating one
     
     Returns:
         distance: DTW distance
-        path: List of (i, j) tuples showing alignment
+        path: int64 array (path_length, 2) of (i, j) index pairs showing alignment
     """
-    x = np.atleast_2d(x)
-    y = np.atleast_2d(y)
-    
-    if x.shape[1] == 1:
-        x = x.reshape(-1)
-        y = y.reshape(-1)
-        is_univariate = True
-    else:
-        is_univariate = False
+    # 1-D input is one feature per time step; rows are made contiguous so
+    # the kernel reads each time step's features from adjacent memory
+    x = np.ascontiguousarray(x).reshape(len(x), -1)
+    y = np.ascontiguousarray(y).reshape(len(y), -1)
+    is_univariate = x.shape[1] == 1
     
     n, m = len(x), len(y)
-    dtw_matrix = np.full((n + 1, m + 1), np.inf)
-    dtw_matrix[0, 0] = 0
+    # The band must at least reach the [n, m] corner
+    window = max(n, m) if window is None else max(window, abs(n - m))
     
-    # Forward pass - build cost matrix
-    for i in range(1, n + 1):
-        for j in range(1, m + 1):
-            if is_univariate:
-                cost = abs(x[i-1] - y[j-1])
-            else:
-                cost = np.linalg.norm(x[i-1] - y[j-1])
-            
-            dtw_matrix[i, j] = cost + min(
-                dtw_matrix[i-1, j],    # insertion
-                dtw_matrix[i, j-1],    # deletion
-                dtw_matrix[i-1, j-1]   # match
-            )
+    # Forward pass and backtracking run compiled (out-of-band cells stay inf);
+    # univariate series use the scalar 1-D kernels
+    if buf is None and _band_storage(m, window):
+        band = np.full((n + 1, 2 * window + 1), np.inf)
+        if is_univariate:
+            return dtw_band_path_1d(x[:, 0], y[:, 0], window, band)
+        return dtw_band_path(x, y, window, band)
     
-    # Backtrack to find optimal path
-    path = []
-    i, j = n, m
-    while i > 0 and j > 0:
-        path.append((i-1, j-1))
-        
-        # Find which direction we came from
-        candidates = [
-            (dtw_matrix[i-1, j-1], i-1, j-1),  # diagonal
-            (dtw_matrix[i-1, j], i-1, j),      # up
-            (dtw_matrix[i, j-1], i, j-1)       # left
-        ]
-        _, i, j = min(candidates, key=lambda x: x[0])
-    
-    path.reverse()
-    return dtw_matrix[n, m], path
+    if buf is None:
+        dtw_matrix = np.full((n + 1, m + 1), np.inf)
+    else:
+        dtw_matrix = buf[:n + 1, :m + 1]
+        dtw_matrix.fill(np.inf)
+    if is_univariate:
+        return dtw_path_1d(x[:, 0], y[:, 0], window, dtw_matrix)
+    return dtw_path(x, y, window, dtw_matrix)
 
 
 def analyze_local_divergence(x, y, path, window_size=10, threshold_percentile=75):
@@ -64,7 +76,7 @@ def analyze_local_divergence(x, y, path, window_size=10, threshold_percentile=75
     Identify periods of high divergence along the DTW alignment path.
     
     Args:
-        x, y: Original aligned series
+        x, y: Original aligned series, (n_samples,) or (n_samples, n_features)
         path: DTW alignment path from dtw_distance_with_path()
         window_size: Size of sliding window for local distance calculation
         threshold_percentile: Percentile threshold for "high divergence"
@@ -74,61 +86,46 @@ def analyze_local_divergence(x, y, path, window_size=10, threshold_percentile=75
         divergence_periods: List of (start_idx, end_idx, severity) tuples
         threshold: The computed threshold value
     """
-    x = np.atleast_2d(x)
-    y = np.atleast_2d(y)
+    # 1-D input is one feature per time step
+    x = np.asarray(x).reshape(len(x), -1)
+    y = np.asarray(y).reshape(len(y), -1)
+    path = np.asarray(path, dtype=np.int64).reshape(-1, 2)
     
+    # Local distance at every path step in one gather
+    diff = x[path[:, 0]] - y[path[:, 1]]
     if x.shape[1] == 1:
-        x = x.reshape(-1)
-        y = y.reshape(-1)
-        is_univariate = True
+        local_distances = np.abs(diff[:, 0])
     else:
-        is_univariate = False
-    
-    # Calculate local distance along path
-    local_distances = []
-    for i_x, i_y in path:
-        if is_univariate:
-            dist = abs(x[i_x] - y[i_y])
-        else:
-            dist = np.linalg.norm(x[i_x] - y[i_y])
-        local_distances.append(dist)
-    
-    local_distances = np.array(local_distances)
-    
-    # Smooth with sliding window
-    divergence_scores = np.convolve(
-        local_distances, 
-        np.ones(window_size) / window_size, 
-        mode='same'
-    )
+        local_distances = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+    
+    # Smooth with a centred moving average. Equivalent to
+    # np.convolve(local_distances, np.ones(w) / w, mode='same'), i.e. zero
+    # padded at both ends, but each window sum is a difference of two
+    # running sums, so the cost is O(n) rather than O(n * w).
+    n_steps = len(local_distances)
+    running = np.concatenate(([0.0], np.cumsum(local_distances, dtype=np.float64)))
+    ends = np.arange(max(n_steps, window_size)) + (min(n_steps, window_size) - 1) // 2
+    divergence_scores = (
+        running[np.minimum(ends + 1, n_steps)] - running[np.clip(ends - window_size + 1, 0, n_steps)]
+    ) / window_size
     
     # Identify divergence periods
     threshold = np.percentile(divergence_scores, threshold_percentile)
     high_divergence = divergence_scores > threshold
     
-    # Find contiguous regions
-    divergence_periods = []
-    in_divergence = False
-    start_idx = 0
-    
-    for idx, is_divergent in enumerate(high_divergence):
-        if is_divergent and not in_divergence:
-            start_idx = idx
-            in_divergence = True
-        elif not is_divergent and in_divergence:
-            severity = np.mean(divergence_scores[start_idx:idx]) / threshold
-            divergence_periods.append((start_idx, idx, severity))
-            in_divergence = False
-    
-    # Handle last period if still in divergence
-    if in_divergence:
-        severity = np.mean(divergence_scores[start_idx:]) / threshold
-        divergence_periods.append((start_idx, len(high_divergence), severity))
+    # Find contiguous regions from the rising (+1) and falling (-1) edges
+    edges = np.diff(high_divergence.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    # Severity is each region's mean score relative to the threshold
+    running = np.concatenate(([0.0], np.cumsum(divergence_scores)))
+    severities = (running[ends] - running[starts]) / (ends - starts) / threshold
+    divergence_periods = list(zip(starts.tolist(), ends.tolist(), severities))
     
     return divergence_scores, divergence_periods, threshold
 
 
-def dtw_distance_multivariate(s1, s2, dist=lambda x, y: np.linalg.norm(x - y)):
+def dtw_distance_multivariate(s1, s2, dist=None, window=None, dtype=np.float64):
     """
     Compute DTW distance between two sequences (supports multivariate).
     
@@ -138,50 +135,98 @@ def dtw_distance_multivariate(s1, s2, dist=lambda x, y: np.linalg.norm(x - y)):
     Args:
         s1: First sequence (1D or 2D numpy array)
         s2: Second sequence (1D or 2D numpy array)
-        dist: Distance function (default: Euclidean norm)
+        dist: Distance function between two time steps (default: None,
+            Euclidean norm computed by the compiled kernel)
+        window: Sakoe-Chiba band radius; cells with |i - j| > window are
+            skipped (default: None, unconstrained)
+        dtype: Precision of the cumulative cost rows; np.float32 halves
+            their memory traffic at the cost of float32 accumulation error
         
     Returns:
-        float: DTW distance (cumulative distance from dtw_matrix[n, m])
+        float: DTW distance (cumulative distance at cell [n, m])
     """
     n, m = len(s1), len(s2)
-    dtw_matrix = np.full((n + 1, m + 1), np.inf)
-    dtw_matrix[0, 0] = 0
-    
+    # The band must at least reach the [n, m] corner
+    window = max(n, m) if window is None else max(window, abs(n - m))
+    # Only the previous row is needed, so keep two rolling rows (O(m) memory)
+    prev = np.full(m + 1, np.inf, dtype=dtype)
+    curr = np.full(m + 1, np.inf, dtype=dtype)
+    
+    if dist is None:
+        # 1-D input is one feature per time step
+        x = np.ascontiguousarray(s1).reshape(n, -1)
+        y = np.ascontiguousarray(s2).reshape(m, -1)
+        return dtw_rows(x, y, window, prev, curr)
+    
+    prev[0] = 0
     for i in range(1, n + 1):
-        for j in range(1, m + 1):
+        j_lo = max(1, i - window)
+        # The band moves right each row; clear the stale cell to its left
+        curr[j_lo - 1] = np.inf
+        for j in range(j_lo, min(m, i + window) + 1):
             cost = dist(s1[i - 1], s2[j - 1])
             last_min = min(
-                dtw_matrix[i - 1, j],      # insertion
-                dtw_matrix[i, j - 1],      # deletion
-                dtw_matrix[i - 1, j - 1]   # match
+                prev[j],       # insertion
+                curr[j - 1],   # deletion
+                prev[j - 1]    # match
             )
-            dtw_matrix[i, j] = cost + last_min
+            curr[j] = cost + last_min
+        prev, curr = curr, prev
     
-    return dtw_matrix[n, m]
+    return prev[m]
 
 
-def dtw_distance(s1, s2):
+def dtw_distance(s1, s2, window=None, buf=None, dtype=np.float64):
     """
     Compute DTW distance between two univariate sequences.
     
     Args:
         s1: First sequence (1D numpy array)
         s2: Second sequence (1D numpy array)
+        window: Sakoe-Chiba band radius; cells with |i - j| > window are
+            skipped (default: None, unconstrained)
+        buf: Optional scratch array of at least (2, len(s2) + 1) reused for
+            the two rolling rows instead of allocating them
+        dtype: Precision of the cumulative cost rows when buf is None;
+            np.float32 halves their memory traffic at the cost of float32
+            accumulation error
         
     Returns:
         float: DTW distance
     """
     n, m = len(s1), len(s2)
-    dtw = np.full((n + 1, m + 1), np.inf)
-    dtw[0, 0] = 0
+    # The band must at least reach the [n, m] corner
+    window = max(n, m) if window is None else max(window, abs(n - m))
+    if buf is None:
+        buf = np.empty((2, m + 1), dtype=dtype)
+    prev, curr = buf[0, :m + 1], buf[1, :m + 1]
+    prev.fill(np.inf)
+    curr.fill(np.inf)
+    return dtw_rows_1d(np.ascontiguousarray(s1), np.ascontiguousarray(s2), window, prev, curr)
+
+
+def dtw_pairwise(arrays, band_pct=100):
+    """
+    Compute DTW distances between every pair of series in one batched call.
     
-    for i in range(1, n + 1):
-        for j in range(1, m + 1):
-            cost = abs(s1[i - 1] - s2[j - 1])
-            dtw[i, j] = cost + min(
-                dtw[i - 1, j],      # insertion
-                dtw[i, j - 1],      # deletion
-                dtw[i - 1, j - 1]   # match
-            )
+    Each pair is truncated to its common length and compared with the
+    compiled batch kernel (Euclidean local cost), so all pairs run in
+    parallel instead of one Python-level DTW per pair.
     
-    return dtw[n, m]
+    Args:
+        arrays: List of numpy arrays of shape (n_samples,) or (n_samples, n_features)
+        band_pct: Sakoe-Chiba band width as a percentage of the pair length
+            (default: 100, unconstrained)
+        
+    Returns:
+        tuple: (pair_i, pair_j, distances) with pairs in itertools.combinations order
+    """
+    arrays = [np.asarray(a, dtype=np.float64) for a in arrays]
+    # The kernel works in float32; centering on a shared offset keeps the
+    # packed values near zero without changing any distance
+    series, lengths = pack_series(arrays, center=True)
+    
+    pair_i, pair_j = np.triu_indices(len(arrays), k=1)
+    distances = np.empty(len(pair_i))
+    get_batch_kernel(series.shape[2])(series, lengths, pair_i, pair_j, float(band_pct), distances)
+    return pair_i, pair_j, distances
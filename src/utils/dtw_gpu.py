@@ -0,0 +1,96 @@
+"""Batched DTW distance computation on GPU (optional PyTorch dependency)"""
+import numpy as np
+
+try:
+    import torch
+except ImportError:  # PyTorch is optional; callers check gpu_available()
+    torch = None
+
+# Upper bound on cost + cumulative matrix memory per GPU chunk (bytes)
+GPU_CHUNK_BYTES = 512 * 1024 ** 2
+
+
+def gpu_available():
+    """
+    Check whether batched GPU DTW can be used.
+
+    Returns:
+        bool: True when PyTorch is installed and a CUDA device is present
+    """
+    return torch is not None and torch.cuda.is_available()
+
+
+def _pair_bytes(length):
+    """Approximate float32 bytes for one pair's cost and cumulative matrices."""
+    return 2 * 4 * (int(length) + 1) ** 2
+
+
+def batch_dtw_gpu(series, lengths, pair_i, pair_j, band_pct=100):
+    """
+    Compute DTW distances for many pairs at once on the GPU.
+
+    Matches dtw_distance_multivariate(): each pair is truncated to its common
+    length, compared with Euclidean local cost and constrained to the same
+    Sakoe-Chiba band as batch_dtw(). All cost matrices in a chunk are filled
+    together, one anti-diagonal per step (wavefront), so every step is a
+    single batched tensor operation.
+
+    Args:
+        series: Packed array (n_series, max_len, n_features) from pack_series()
+        lengths: Valid length of each packed series
+        pair_i: Index of the first series of each pair
+        pair_j: Index of the second series of each pair
+        band_pct: Band width as a percentage of the pair length (100 = unconstrained)
+
+    Returns:
+        np.ndarray: DTW distance per pair (NaN where either series is empty)
+    """
+    device = torch.device('cuda')
+    pair_i = np.asarray(pair_i)
+    pair_j = np.asarray(pair_j)
+    pair_len = np.minimum(lengths[pair_i], lengths[pair_j])
+    distances = np.full(len(pair_i), np.nan)
+
+    # Process pairs in order of length so each chunk is cropped tightly
+    order = np.argsort(pair_len, kind='stable')
+    order = order[pair_len[order] > 0]
+    x = torch.as_tensor(series, device=device)
+
+    start = 0
+    while start < len(order):
+        # Size the chunk from its shortest pair, then shrink to fit its longest
+        size = max(1, GPU_CHUNK_BYTES // _pair_bytes(pair_len[order[start]]))
+        t = int(pair_len[order[min(start + size, len(order)) - 1]])
+        size = min(size, max(1, GPU_CHUNK_BYTES // _pair_bytes(t)))
+        idx = order[start:start + size]
+        t = int(pair_len[idx[-1]])
+
+        a = x[torch.as_tensor(pair_i[idx], device=device), :t]
+        b = x[torch.as_tensor(pair_j[idx], device=device), :t]
+        cost = torch.cdist(a, b, compute_mode='donot_use_mm_for_euclid_dist')
+
+        # Cells outside each pair's band can never be on the path
+        radius = np.maximum(1, (pair_len[idx] * band_pct / 100.0).astype(np.int64))
+        steps = torch.arange(t, device=device)
+        offset = (steps[:, None] - steps[None, :]).abs()
+        out_of_band = offset[None] > torch.as_tensor(radius, device=device)[:, None, None]
+        cost = cost.masked_fill(out_of_band, float('inf'))
+
+        acc = torch.full((len(idx), t + 1, t + 1), float('inf'), device=device, dtype=cost.dtype)
+        acc[:, 0, 0] = 0
+        for k in range(2, 2 * t + 1):
+            rows = torch.arange(max(1, k - t), min(t, k - 1) + 1, device=device)
+            cols = k - rows
+            best_prev = torch.minimum(
+                torch.minimum(acc[:, rows - 1, cols],    # insertion
+                              acc[:, rows, cols - 1]),   # deletion
+                acc[:, rows - 1, cols - 1]               # match
+            )
+            acc[:, rows, cols] = cost[:, rows - 1, cols - 1] + best_prev
+
+        # The corner of a shorter pair is unaffected by cells beyond its length
+        ends = torch.as_tensor(pair_len[idx], device=device)
+        distances[idx] = acc[torch.arange(len(idx), device=device), ends, ends].cpu().numpy()
+        start += size
+
+    return distances
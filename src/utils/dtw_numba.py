@@ -0,0 +1,403 @@
+"""Numba-compiled DTW kernels (optional numba dependency)"""
+import functools
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:  # Fall back to plain Python execution of the same kernels
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit when numba is not installed."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# fastmath without 'nnan'/'ninf': the DP relies on inf for unreachable cells
+FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+BATCH_SIGNATURE = 'void(float32[:, :, ::1], int64[:], int64[:], int64[:], float64, float64[:])'
+
+# Feature counts up to this get a generated kernel with the feature loop unrolled
+MAX_UNROLLED_FEATURES = 4
+
+
+@njit(cache=True)
+def band_radius(n, band_pct):
+    """
+    Sakoe-Chiba band radius for a series of length n.
+
+    Args:
+        n: Series length
+        band_pct: Band width as a percentage of n (100 = unconstrained)
+
+    Returns:
+        int: Maximum allowed |i - j| offset (at least 1)
+    """
+    return max(1, int(n * band_pct / 100.0))
+
+
+@njit(BATCH_SIGNATURE, parallel=True, fastmath=FASTMATH, cache=True)
+def batch_dtw(series, lengths, pair_i, pair_j, band_pct, out):
+    """
+    Compute multivariate DTW distances for many pairs in parallel.
+
+    Matches dtw_distance_multivariate(): each pair is truncated to its common
+    length and compared with Euclidean local cost. The warping path is kept
+    within a Sakoe-Chiba band of band_radius() cells around the diagonal.
+    Series are float32, so distances carry float32 input precision; the
+    cumulative cost is accumulated in float64.
+
+    Args:
+        series: Packed array (n_series, max_len, n_features) from pack_series()
+        lengths: Valid length of each packed series
+        pair_i: Index of the first series of each pair
+        pair_j: Index of the second series of each pair
+        band_pct: Band width as a percentage of the pair length (100 = unconstrained)
+        out: Output array receiving one distance per pair (NaN if a series is empty)
+    """
+    n_features = series.shape[2]
+    for p in prange(len(pair_i)):
+        x = series[pair_i[p]]
+        y = series[pair_j[p]]
+        n = min(lengths[pair_i[p]], lengths[pair_j[p]])
+        if n == 0:
+            out[p] = np.nan
+        else:
+            # Two rolling rows of the cumulative matrix: O(n) memory per pair.
+            # Only cells with |i - j| <= w are filled; the rest stay inf.
+            w = band_radius(n, band_pct)
+            prev = np.full(n + 1, np.inf)
+            curr = np.full(n + 1, np.inf)
+            prev[0] = 0.0
+            for i in range(1, n + 1):
+                j_lo = max(1, i - w)
+                # The band moves right each row; clear the stale cell to its left
+                curr[j_lo - 1] = np.inf
+                for j in range(j_lo, min(n, i + w) + 1):
+                    sq = 0.0
+                    for k in range(n_features):
+                        diff = x[i - 1, k] - y[j - 1, k]
+                        sq += diff * diff
+                    curr[j] = np.sqrt(sq) + min(
+                        prev[j],       # insertion
+                        curr[j - 1],   # deletion
+                        prev[j - 1]    # match
+                    )
+                prev, curr = curr, prev
+            out[p] = prev[n]
+
+
+@njit(fastmath=FASTMATH, nogil=True, cache=True)
+def dtw_rows(x, y, window, prev, curr):
+    """
+    Banded DTW distance with Euclidean cost using two rolling rows.
+
+    Args:
+        x: First series (n, n_features)
+        y: Second series (m, n_features)
+        window: Sakoe-Chiba band radius (must reach the [n, m] corner)
+        prev, curr: Scratch rows of length m + 1, pre-filled with inf
+
+    Returns:
+        float: DTW distance (cumulative cost at cell [n, m])
+    """
+    n, m = x.shape[0], y.shape[0]
+    n_features = x.shape[1]
+    prev[0] = 0.0
+    for i in range(1, n + 1):
+        j_lo = max(1, i - window)
+        # The band moves right each row; clear the stale cell to its left
+        curr[j_lo - 1] = np.inf
+        for j in range(j_lo, min(m, i + window) + 1):
+            sq = 0.0
+            for k in range(n_features):
+                diff = x[i - 1, k] - y[j - 1, k]
+                sq += diff * diff
+            curr[j] = np.sqrt(sq) + min(
+                prev[j],       # insertion
+                curr[j - 1],   # deletion
+                prev[j - 1]    # match
+            )
+        prev, curr = curr, prev
+    return prev[m]
+
+
+@njit(fastmath=FASTMATH, nogil=True, cache=True)
+def dtw_rows_1d(x, y, window, prev, curr):
+    """
+    Univariate dtw_rows() on 1-D series, with absolute difference as cost.
+
+    Args:
+        x: First series (n,)
+        y: Second series (m,)
+        window: Sakoe-Chiba band radius (must reach the [n, m] corner)
+        prev, curr: Scratch rows of length m + 1, pre-filled with inf
+
+    Returns:
+        float: DTW distance (cumulative cost at cell [n, m])
+    """
+    n, m = x.shape[0], y.shape[0]
+    prev[0] = 0.0
+    for i in range(1, n + 1):
+        a = x[i - 1]
+        j_lo = max(1, i - window)
+        curr[j_lo - 1] = np.inf
+        for j in range(j_lo, min(m, i + window) + 1):
+            curr[j] = abs(a - y[j - 1]) + min(prev[j], curr[j - 1], prev[j - 1])
+        prev, curr = curr, prev
+    return prev[m]
+
+
+@njit(nogil=True, cache=True)
+def _backtrack(acc):
+    """
+    Trace the optimal path back from the corner of a filled DTW matrix.
+
+    Ties are broken in favour of the diagonal, then insertion, then deletion.
+
+    Args:
+        acc: Cumulative matrix of shape (n + 1, m + 1)
+
+    Returns:
+        np.ndarray: int64 array (path_length, 2) of (i, j) index pairs
+    """
+    n, m = acc.shape[0] - 1, acc.shape[1] - 1
+    # A path visits at most n + m cells; fill it from the end
+    path = np.empty((n + m, 2), dtype=np.int64)
+    k = n + m
+    i, j = n, m
+    while i > 0 and j > 0:
+        k -= 1
+        path[k, 0] = i - 1
+        path[k, 1] = j - 1
+        diag, up, left = acc[i - 1, j - 1], acc[i - 1, j], acc[i, j - 1]
+        if diag <= up and diag <= left:
+            i -= 1
+            j -= 1
+        elif up <= left:
+            i -= 1
+        else:
+            j -= 1
+    return path[k:]
+
+
+# nogil: the single-file page runs one path per worker thread
+@njit(fastmath=FASTMATH, nogil=True, cache=True)
+def dtw_path(x, y, window, acc):
+    """
+    Fill a banded DTW cumulative matrix and backtrack the optimal path.
+
+    Matches the DP in dtw_distance_with_path(): Euclidean local cost
+    between time steps.
+
+    Args:
+        x: First series (n, n_features)
+        y: Second series (m, n_features)
+        window: Sakoe-Chiba band radius (must reach the [n, m] corner)
+        acc: Cumulative matrix of shape (n + 1, m + 1), pre-filled with inf
+
+    Returns:
+        tuple: (distance, path) with path an int64 array (path_length, 2)
+    """
+    n, m = x.shape[0], y.shape[0]
+    n_features = x.shape[1]
+    acc[0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(max(1, i - window), min(m, i + window) + 1):
+            sq = 0.0
+            for k in range(n_features):
+                diff = x[i - 1, k] - y[j - 1, k]
+                sq += diff * diff
+            acc[i, j] = np.sqrt(sq) + min(
+                acc[i - 1, j],      # insertion
+                acc[i, j - 1],      # deletion
+                acc[i - 1, j - 1]   # match
+            )
+    return acc[n, m], _backtrack(acc)
+
+
+@njit(fastmath=FASTMATH, nogil=True, cache=True)
+def dtw_path_1d(x, y, window, acc):
+    """
+    Univariate dtw_path() on 1-D series, with absolute difference as cost.
+
+    Args:
+        x: First series (n,)
+        y: Second series (m,)
+        window: Sakoe-Chiba band radius (must reach the [n, m] corner)
+        acc: Cumulative matrix of shape (n + 1, m + 1), pre-filled with inf
+
+    Returns:
+        tuple: (distance, path) with path an int64 array (path_length, 2)
+    """
+    n, m = x.shape[0], y.shape[0]
+    acc[0, 0] = 0.0
+    for i in range(1, n + 1):
+        a = x[i - 1]
+        for j in range(max(1, i - window), min(m, i + window) + 1):
+            acc[i, j] = abs(a - y[j - 1]) + min(
+                acc[i - 1, j],      # insertion
+                acc[i, j - 1],      # deletion
+                acc[i - 1, j - 1]   # match
+            )
+    return acc[n, m], _backtrack(acc)
+
+
+@njit(nogil=True, cache=True)
+def _backtrack_band(acc, m, window):
+    """
+    _backtrack() on a banded matrix from dtw_band_path().
+
+    Args:
+        acc: Banded cumulative matrix of shape (n + 1, 2 * window + 1)
+        m: Length of the second series
+        window: Sakoe-Chiba band radius the matrix was filled with
+
+    Returns:
+        np.ndarray: int64 array (path_length, 2) of (i, j) index pairs
+    """
+    n, width = acc.shape[0] - 1, acc.shape[1]
+    path = np.empty((n + m, 2), dtype=np.int64)
+    k = n + m
+    i, j = n, m
+    while i > 0 and j > 0:
+        k -= 1
+        path[k, 0] = i - 1
+        path[k, 1] = j - 1
+        # Cell (i, j) is stored at column j - i + window; outside the band is inf
+        c = j - i + window
+        diag = acc[i - 1, c]
+        up = acc[i - 1, c + 1] if c + 1 < width else np.inf
+        left = acc[i, c - 1] if c > 0 else np.inf
+        if diag <= up and diag <= left:
+            i -= 1
+            j -= 1
+        elif up <= left:
+            i -= 1
+        else:
+            j -= 1
+    return path[k:]
+
+
+@njit(fastmath=FASTMATH, nogil=True, cache=True)
+def dtw_band_path(x, y, window, acc):
+    """
+    dtw_path() storing only the Sakoe-Chiba band of the cumulative matrix.
+
+    Row i keeps cells j = i - window .. i + window, so memory is
+    O(n * window) instead of O(n * m). Distance and path are identical.
+
+    Args:
+        x: First series (n, n_features)
+        y: Second series (m, n_features)
+        window: Sakoe-Chiba band radius (must reach the [n, m] corner)
+        acc: Banded matrix of shape (n + 1, 2 * window + 1), pre-filled with inf
+
+    Returns:
+        tuple: (distance, path) with path an int64 array (path_length, 2)
+    """
+    n, m = x.shape[0], y.shape[0]
+    n_features = x.shape[1]
+    width = acc.shape[1]
+    acc[0, window] = 0.0
+    for i in range(1, n + 1):
+        for j in range(max(1, i - window), min(m, i + window) + 1):
+            c = j - i + window
+            sq = 0.0
+            for k in range(n_features):
+                diff = x[i - 1, k] - y[j - 1, k]
+                sq += diff * diff
+            acc[i, c] = np.sqrt(sq) + min(
+                acc[i - 1, c + 1] if c + 1 < width else np.inf,   # insertion
+                acc[i, c - 1] if c > 0 else np.inf,               # deletion
+                acc[i - 1, c]                                     # match
+            )
+    return acc[n, m - n + window], _backtrack_band(acc, m, window)
+
+
+@njit(fastmath=FASTMATH, nogil=True, cache=True)
+def dtw_band_path_1d(x, y, window, acc):
+    """
+    Univariate dtw_band_path() on 1-D series, with absolute difference as cost.
+
+    Args:
+        x: First series (n,)
+        y: Second series (m,)
+        window: Sakoe-Chiba band radius (must reach the [n, m] corner)
+        acc: Banded matrix of shape (n + 1, 2 * window + 1), pre-filled with inf
+
+    Returns:
+        tuple: (distance, path) with path an int64 array (path_length, 2)
+    """
+    n, m = x.shape[0], y.shape[0]
+    width = acc.shape[1]
+    acc[0, window] = 0.0
+    for i in range(1, n + 1):
+        a = x[i - 1]
+        for j in range(max(1, i - window), min(m, i + window) + 1):
+            c = j - i + window
+            acc[i, c] = abs(a - y[j - 1]) + min(
+                acc[i - 1, c + 1] if c + 1 < width else np.inf,   # insertion
+                acc[i, c - 1] if c > 0 else np.inf,               # deletion
+                acc[i - 1, c]                                     # match
+            )
+    return acc[n, m - n + window], _backtrack_band(acc, m, window)
+
+
+_SPECIALIZED_TEMPLATE = """
+def batch_dtw_specialized(series, lengths, pair_i, pair_j, band_pct, out):
+    for p in prange(len(pair_i)):
+        x = series[pair_i[p]]
+        y = series[pair_j[p]]
+        n = min(lengths[pair_i[p]], lengths[pair_j[p]])
+        if n == 0:
+            out[p] = np.nan
+        else:
+            w = band_radius(n, band_pct)
+            prev = np.full(n + 1, np.inf)
+            curr = np.full(n + 1, np.inf)
+            prev[0] = 0.0
+            for i in range(1, n + 1):
+{row_loads}
+                j_lo = max(1, i - w)
+                curr[j_lo - 1] = np.inf
+                for j in range(j_lo, min(n, i + w) + 1):
+{cell_diffs}
+                    curr[j] = np.sqrt({sum_sq}) + min(prev[j], curr[j - 1], prev[j - 1])
+                prev, curr = curr, prev
+            out[p] = prev[n]
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def get_batch_kernel(n_features):
+    """
+    Return a batch_dtw() variant specialized for a fixed number of features.
+
+    For small feature counts the per-cell feature loop is generated fully
+    unrolled, with the current row of x hoisted out of the inner loop, so
+    LLVM sees straight-line arithmetic. Kernels are compiled once per
+    feature count and reused for the rest of the process.
+
+    Args:
+        n_features: Number of features (columns) per time step
+
+    Returns:
+        Callable with the same signature as batch_dtw()
+    """
+    if not NUMBA_AVAILABLE or not 1 <= n_features <= MAX_UNROLLED_FEATURES:
+        return batch_dtw
+
+    source = _SPECIALIZED_TEMPLATE.format(
+        row_loads="\n".join(f"                a{k} = x[i - 1, {k}]" for k in range(n_features)),
+        cell_diffs="\n".join(f"                    d{k} = a{k} - y[j - 1, {k}]" for k in range(n_features)),
+        # Leading 0.0 keeps the accumulation in float64, as in batch_dtw()
+        sum_sq=" + ".join(["0.0"] + [f"d{k} * d{k}" for k in range(n_features)])
+    )
+    namespace = {'np': np, 'prange': prange, 'band_radius': band_radius}
+    exec(source, namespace)
+    # Generated source has no backing file, so it cannot use numba's disk cache
+    return njit(BATCH_SIGNATURE, parallel=True, fastmath=FASTMATH)(namespace['batch_dtw_specialized'])
@@ -1,6 +1,21 @@
 """File I/O utilities for reading CSV and Excel files"""
+import os
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pyarrow is optional; pandas' own parser is used instead
+    pa = None
+
+try:
+    import python_calamine  # noqa: F401  (backs pandas' built-in 'calamine' engine)
+    # pandas only accepts engine='calamine' from 2.2 on
+    _PANDAS_VERSION = tuple(int(part) for part in pd.__version__.split('.')[:2])
+    EXCEL_ENGINE = 'calamine' if _PANDAS_VERSION >= (2, 2) else None
+except ImportError:  # python-calamine is optional; pandas picks openpyxl
+    EXCEL_ENGINE = None
+
 
 def read_file(file):
     """
@@ -13,9 +28,9 @@ def read_file(file):
         pd.DataFrame: Loaded data
     """
     if file.name.endswith('.csv'):
-        return pd.read_csv(file)
+        return _read_csv(file)
     else:
-        return pd.read_excel(file)
+        return _read_excel(file)
 
 
 def read_file_from_path(file_path):
@@ -29,6 +44,84 @@ def read_file_from_path(file_path):
         pd.DataFrame: Loaded data
     """
     if file_path.endswith('.csv'):
-        return pd.read_csv(file_path)
+        return _read_csv(file_path)
     else:
-        return pd.read_excel(file_path)
+        return _read_excel_with_sidecar(file_path)
+
+
+def _read_csv(source):
+    """
+    Parse a CSV with pyarrow's multi-threaded reader, falling back to pandas.
+    
+    Files with duplicate or empty header names go through pandas so their
+    columns get the same unique names as a plain pd.read_csv().
+    
+    Args:
+        source: File path or binary file object
+        
+    Returns:
+        pd.DataFrame: Loaded data (NumPy-backed columns)
+    """
+    if pa is not None:
+        try:
+            # Multi-threaded Arrow parser, much faster than pandas on large files
+            read_options = pa_csv.ReadOptions(use_threads=True)
+            table = pa_csv.read_csv(source, read_options=read_options)
+            names = table.column_names
+            # Arrow keeps duplicate and empty headers as-is, where pandas
+            # renames them ('a.1', 'Unnamed: 2'); only unique names are safe
+            if all(names) and len(set(names)) == len(names):
+                return table.to_pandas()
+        except pa.ArrowInvalid:
+            # Irregular CSV that Arrow rejects; let pandas try
+            pass
+        if hasattr(source, 'seek'):
+            source.seek(0)
+    return pd.read_csv(source)
+
+
+def _read_excel(source):
+    """
+    Parse an Excel file with the Rust calamine reader when it is installed.
+    
+    Args:
+        source: File path or binary file object
+        
+    Returns:
+        pd.DataFrame: Loaded data
+    """
+    return pd.read_excel(source, engine=EXCEL_ENGINE)
+
+
+def _read_excel_with_sidecar(file_path):
+    """
+    Read an Excel file, reusing a Parquet copy stored next to it when fresh.
+    
+    Parsing xlsx is slow even in openpyxl's read-only mode, so the first read
+    writes `<file>.xlsx.parquet` and later reads use it while it is newer
+    than the workbook. Without pyarrow, or when the sidecar cannot be
+    written (read-only folder, types Parquet cannot store), this is a plain
+    Excel read.
+    
+    Args:
+        file_path: Path to the .xlsx file
+        
+    Returns:
+        pd.DataFrame: Loaded data
+    """
+    sidecar = file_path + '.parquet'
+    if pa is None:
+        return _read_excel(file_path)
+    
+    try:
+        if os.path.getmtime(sidecar) >= os.path.getmtime(file_path):
+            return pd.read_parquet(sidecar)
+    except (OSError, pa.ArrowException):
+        pass  # No usable sidecar yet
+    
+    df = _read_excel(file_path)
+    try:
+        df.to_parquet(sidecar, compression='snappy')
+    except (OSError, ValueError, pa.ArrowException):
+        pass
+    return df
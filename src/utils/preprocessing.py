@@ -1,4 +1,5 @@
 """Data preprocessing utilities including datetime handling and outlier removal"""
+import datetime
 import pandas as pd
 import numpy as np
 from src.config import IQR_MULTIPLIER
@@ -16,9 +17,13 @@ def add_datetime(df, date_col, time_col):
     Returns:
         pd.DataFrame: DataFrame with added 'Datetime' column, sorted by datetime
     """
+    offsets = None if time_col == "None" else _parse_times(df[time_col])
     if time_col == "None":
-        df['Datetime'] = pd.to_datetime(df[date_col].astype(str), errors='coerce')
+        df['Datetime'] = _parse_dates(df[date_col])
+    elif offsets is not None:
+        df['Datetime'] = _parse_dates(df[date_col]) + offsets
     else:
+        # Free-form time values: let pandas parse the combined strings
         df['Datetime'] = pd.to_datetime(
             df[date_col].astype(str) + " " + df[time_col].astype(str),
             errors='coerce'
@@ -27,6 +32,53 @@ def add_datetime(df, date_col, time_col):
     return df
 
 
+def _first_valid(values):
+    """Return the first non-missing value of a Series, or None."""
+    idx = values.first_valid_index()
+    return None if idx is None else values.loc[idx]
+
+
+def _parse_dates(values):
+    """
+    Convert a date column to datetimes without a string round-trip when possible.
+    
+    Args:
+        values: pandas Series holding the date column
+        
+    Returns:
+        pd.Series: Parsed datetimes (NaT where unparseable); free-form date
+        strings are parsed from their text, as before
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if pd.api.types.is_integer_dtype(values) and values.between(10000101, 99991231).all():
+        # Integer YYYYMMDD dates: one fixed-format pass, no inference
+        return pd.to_datetime(values, format='%Y%m%d', errors='coerce')
+    if isinstance(_first_valid(values), datetime.date):
+        # date/datetime objects (pyarrow CSV reads, Excel cells) convert directly
+        return pd.to_datetime(values, errors='coerce')
+    return pd.to_datetime(values.astype(str), errors='coerce')
+
+
+def _parse_times(values):
+    """
+    Convert a time-of-day column to offsets from midnight when its type is unambiguous.
+    
+    Args:
+        values: pandas Series holding the time column
+        
+    Returns:
+        pd.Series or None: Timedeltas, or None for free-form values that
+        must be parsed together with the date
+    """
+    if pd.api.types.is_timedelta64_dtype(values):
+        return values
+    if isinstance(_first_valid(values), datetime.time):
+        # str(datetime.time) is always ISO 'HH:MM:SS[.ffffff]'
+        return pd.to_timedelta(values.astype(str), errors='coerce')
+    return None
+
+
 def remove_outliers_iqr_multicol(df, columns):
     """
     Remove outliers from multiple columns using IQR method.
@@ -38,14 +90,22 @@ def remove_outliers_iqr_multicol(df, columns):
     Returns:
         pd.DataFrame: DataFrame with outliers removed
     """
-    mask = pd.Series(True, index=df.index)
-    for col in columns:
-        Q1 = df[col].quantile(0.25)
-        Q3 = df[col].quantile(0.75)
-        IQR = Q3 - Q1
-        lower_bound = Q1 - IQR_MULTIPLIER * IQR
-        upper_bound = Q3 + IQR_MULTIPLIER * IQR
-        mask &= (df[col] >= lower_bound) & (df[col] <= upper_bound)
+    # Bounds for all columns at once, then one vectorized mask over the block
+    values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    # Linear interpolation, as pandas; NaN-aware only when there are gaps
+    quantile = np.nanquantile if np.isnan(values).any() else np.quantile
+    Q1, Q3 = quantile(values, [0.25, 0.75], axis=0)
+    IQR = Q3 - Q1
+    lower_bound = Q1 - IQR_MULTIPLIER * IQR
+    upper_bound = Q3 + IQR_MULTIPLIER * IQR
+    mask = ((values >= lower_bound) & (values <= upper_bound)).all(axis=1)
+    
+    if mask.all():
+        # Fast path: nothing to drop, so skip the filtering copy. A shallow
+        # copy still gives callers a new frame, never the (cached) input.
+        if df.index.equals(pd.RangeIndex(len(df))):
+            return df.copy(deep=False)
+        return df.reset_index(drop=True)
     return df[mask].reset_index(drop=True)
 
 
@@ -67,6 +127,53 @@ def remove_outliers_iqr(series):
     return series[(series >= lower) & (series <= upper)]
 
 
+def remove_outliers_iqr_columns(df, columns):
+    """
+    Remove outliers from each column independently using IQR method.
+    
+    Equivalent to remove_outliers_iqr(df[col].dropna()) for every column,
+    but the quartiles of all columns are computed in one pass.
+    
+    Args:
+        df: DataFrame containing the data
+        columns: List of column names to clean
+        
+    Returns:
+        dict: Column name -> pd.Series with missing values and outliers removed
+    """
+    block = df[list(columns)]
+    quartiles = block.quantile([0.25, 0.75])
+    Q1 = quartiles.loc[0.25]
+    Q3 = quartiles.loc[0.75]
+    IQR = Q3 - Q1
+    # NaN compares False, so missing values are dropped with the outliers
+    keep = block.ge(Q1 - IQR_MULTIPLIER * IQR) & block.le(Q3 + IQR_MULTIPLIER * IQR)
+    return {c: block[c][keep[c]] for c in columns}
+
+
+def _pooled_moments(arrays):
+    """
+    Per-column mean and std of several arrays taken together, without stacking them.
+    
+    Combines each array's own mean and variance (law of total variance), so
+    the result equals np.vstack(arrays).mean/std(axis=0) without allocating
+    the stacked copy. Statistics are accumulated in float64.
+    
+    Args:
+        arrays: List of non-empty arrays (n_samples,) or (n_samples, n_features)
+        
+    Returns:
+        tuple: (means, stds) as float64 arrays
+    """
+    counts = np.array([len(arr) for arr in arrays], dtype=np.float64)
+    means = np.array([arr.mean(axis=0, dtype=np.float64) for arr in arrays])
+    variances = np.array([arr.var(axis=0, dtype=np.float64) for arr in arrays])
+    weights = (counts / counts.sum()).reshape(-1, *[1] * (means.ndim - 1))
+    pooled_mean = (weights * means).sum(axis=0)
+    pooled_var = (weights * (variances + (means - pooled_mean) ** 2)).sum(axis=0)
+    return np.atleast_1d(pooled_mean), np.atleast_1d(np.sqrt(pooled_var))
+
+
 def normalize_data(x, y):
     """
     Normalize two datasets using combined statistics (z-score normalization).
@@ -76,14 +183,12 @@ def normalize_data(x, y):
         y: Second numpy array (can be 1D or 2D)
         
     Returns:
-        tuple: (normalized_x, normalized_y)
+        tuple: (normalized_x, normalized_y) (float inputs keep their dtype)
     """
-    combined = np.vstack([x, y])
-    means = combined.mean(axis=0)
-    stds = combined.std(axis=0)
+    means, stds = _pooled_moments([x, y])
     stds[stds == 0] = 1  # Avoid division by zero
-    x_norm = (x - means) / stds
-    y_norm = (y - means) / stds
+    x_norm = ((x - means) / stds).astype(np.result_type(x.dtype, np.float32), copy=False)
+    y_norm = ((y - means) / stds).astype(np.result_type(y.dtype, np.float32), copy=False)
     return x_norm, y_norm
 
 
@@ -95,17 +200,15 @@ def normalize_multiple_arrays(arrays):
         arrays: Dictionary of {name: numpy_array}
         
     Returns:
-        dict: Dictionary of {name: normalized_array}
+        dict: Dictionary of {name: normalized_array} (float inputs keep their dtype)
     """
-    all_data = np.vstack([arr for arr in arrays.values() if len(arr) > 0])
-    means = all_data.mean(axis=0)
-    stds = all_data.std(axis=0)
+    means, stds = _pooled_moments([arr for arr in arrays.values() if len(arr) > 0])
     stds[stds == 0] = 1
     
     normalized = {}
     for name, arr in arrays.items():
         if len(arr) > 0:
-            normalized[name] = (arr - means) / stds
+            normalized[name] = ((arr - means) / stds).astype(np.result_type(arr.dtype, np.float32), copy=False)
         else:
             normalized[name] = arr
     
@@ -125,3 +228,30 @@ def align_lengths(x, y):
     """
     min_len = min(len(x), len(y))
     return x[:min_len], y[:min_len]
+
+
+def pack_series(arrays, dtype=np.float32, center=False):
+    """
+    Stack variable-length arrays into one contiguous, zero-padded block.
+    
+    Args:
+        arrays: List of numpy arrays of shape (n_samples,) or (n_samples, n_features)
+        dtype: Output dtype (default: float32)
+        center: Subtract one shared offset (the mean of the series means)
+            from every series before the cast. DTW distances are unchanged,
+            but values land near zero, where float32 resolution is finest.
+        
+    Returns:
+        tuple: (packed array of shape (n_series, max_len, n_features), int64 lengths array)
+    """
+    arrays = [a[:, np.newaxis] if a.ndim == 1 else a for a in map(np.asarray, arrays)]
+    lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+    offset = 0.0
+    if center:
+        means = [a.mean(axis=0, dtype=np.float64) for a in arrays if len(a)]
+        offset = np.mean(means, axis=0) if means else 0.0
+    packed = np.zeros((len(arrays), lengths.max(initial=0), arrays[0].shape[1]), dtype=dtype)
+    for k, arr in enumerate(arrays):
+        # The subtraction runs in float64; only its result is cast
+        packed[k, :len(arr)] = arr - offset
+    return packed, lengths
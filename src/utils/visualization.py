@@ -1,9 +1,44 @@
 """Visualization utilities for plotting time series and heatmaps"""
 import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 import pandas as pd
 
+# Line plots longer than this are reduced to per-bucket min/max samples
+MAX_PLOT_POINTS = 2000
+
+# Heatmaps with more rows than this are drawn without per-cell values
+MAX_ANNOTATED_LABELS = 20
+
+
+def _downsample(x, y, target_points=MAX_PLOT_POINTS):
+    """
+    Reduce a long series to min/max samples per bucket for plotting.
+    
+    Each bucket keeps its lowest and highest sample in time order, so peaks
+    stay visible while the number of drawn segments stays near target_points.
+    
+    Args:
+        x: Positions matching y (numpy array or pandas Index)
+        y: 1D series values
+        target_points: Series up to this length are returned unchanged
+        
+    Returns:
+        tuple: (x, y) restricted to the kept samples
+    """
+    y = np.asarray(y)
+    n = len(y)
+    if n <= target_points:
+        return x, y
+    
+    bucket = -(-n // (target_points // 2))
+    n_full = n - n % bucket
+    blocks = y[:n_full].reshape(-1, bucket)
+    offsets = np.arange(0, n_full, bucket)
+    extremes = np.stack([blocks.argmin(axis=1), blocks.argmax(axis=1)], axis=1)
+    idx = np.concatenate([(np.sort(extremes, axis=1) + offsets[:, None]).ravel(),
+                          np.arange(n_full, n)])
+    return x[idx], y[idx]
+
 
 def plot_time_series_comparison(x, y, cols1, cols2, title="Time Series Comparison"):
     """
@@ -22,13 +57,13 @@ def plot_time_series_comparison(x, y, cols1, cols2, title="Time Series Compariso
     fig, ax = plt.subplots(figsize=(14, 6))
     
     if len(cols1) == 1:
-        ax.plot(range(len(x)), x.flatten(), label=f'Dataset 1: {cols1[0]}', color='blue')
-        ax.plot(range(len(y)), y.flatten(), label=f'Dataset 2: {cols2[0]}', color='orange')
+        ax.plot(*_downsample(np.arange(len(x)), x.flatten()), label=f'Dataset 1: {cols1[0]}', color='blue')
+        ax.plot(*_downsample(np.arange(len(y)), y.flatten()), label=f'Dataset 2: {cols2[0]}', color='orange')
         ax.set_ylabel(f"{cols1[0]} / {cols2[0]}")
     else:
         for i, (col1, col2) in enumerate(zip(cols1, cols2)):
-            ax.plot(range(len(x)), x[:, i], label=f'Dataset 1 - {col1}')
-            ax.plot(range(len(y)), y[:, i], label=f'Dataset 2 - {col2}')
+            ax.plot(*_downsample(np.arange(len(x)), x[:, i]), label=f'Dataset 1 - {col1}')
+            ax.plot(*_downsample(np.arange(len(y)), y[:, i]), label=f'Dataset 2 - {col2}')
         ax.set_ylabel("Normalized Value")
     
     ax.set_title(title)
@@ -53,8 +88,8 @@ def plot_single_comparison(s1, s2, col1, col2, distance):
         matplotlib.figure.Figure: The created figure
     """
     fig, ax = plt.subplots(figsize=(10, 4))
-    ax.plot(range(len(s1)), s1, label=col1)
-    ax.plot(range(len(s2)), s2, label=col2)
+    ax.plot(*_downsample(np.arange(len(s1)), s1), label=col1)
+    ax.plot(*_downsample(np.arange(len(s2)), s2), label=col2)
     ax.set_title(f"{col1} vs {col2} (DTW Distance: {distance:.3f})")
     ax.set_xlabel("Time Index (aligned)")
     ax.set_ylabel("Normalized Value")
@@ -76,9 +111,21 @@ def plot_heatmap(dist_matrix, labels, title="DTW Distance Matrix"):
         matplotlib.figure.Figure: The created figure
     """
     fig, ax = plt.subplots(figsize=(10, 8))
-    sns.heatmap(dist_matrix, annot=True, fmt=".1f",
-               xticklabels=labels, yticklabels=labels,
-               ax=ax, cmap="viridis")
+    # One image for the whole matrix instead of one patch per cell
+    im = ax.imshow(dist_matrix, cmap="viridis", aspect="auto")
+    fig.colorbar(im, ax=ax)
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels, rotation=45, ha="right")
+    ax.set_yticks(range(len(labels)))
+    ax.set_yticklabels(labels)
+    
+    # Per-cell text is only legible (and cheap) for small matrices
+    if len(labels) <= MAX_ANNOTATED_LABELS:
+        scaled = im.norm(dist_matrix)
+        for (i, j), value in np.ndenumerate(dist_matrix):
+            if np.isfinite(value):
+                ax.text(j, i, f"{value:.1f}", ha="center", va="center",
+                        color="white" if scaled[i, j] < 0.5 else "black")
     ax.set_title(title)
     
     return fig
@@ -95,9 +142,58 @@ def compute_ranking(dist_matrix, names):
     Returns:
         list: List of tuples (name, mean_distance) sorted by distance (descending)
     """
-    # Exclude self-comparison (diagonal = 0) by replacing with NaN
-    mean_distances = np.nanmean(np.where(dist_matrix == 0, np.nan, dist_matrix), axis=1)
-    ranking = sorted(zip(names, mean_distances), key=lambda x: -x[1])
+    # Exclude self-comparison by blanking the diagonal of a float copy
+    masked = np.array(dist_matrix, dtype=float)
+    np.fill_diagonal(masked, np.nan)
+    mean_distances = np.nanmean(masked, axis=1)
+    order = np.argsort(-mean_distances, kind='stable')
+    ranking = [(names[i], mean_distances[i]) for i in order]
+    return ranking
+
+
+def condensed_to_square(condensed, pair_i, pair_j, n):
+    """
+    Expand condensed pairwise distances into a symmetric matrix.
+    
+    Args:
+        condensed: 1D array with one distance per pair
+        pair_i, pair_j: Index arrays identifying each pair
+        n: Number of entities
+        
+    Returns:
+        np.ndarray: (n, n) symmetric distance matrix with a zero diagonal
+    """
+    dist_matrix = np.zeros((n, n))
+    dist_matrix[pair_i, pair_j] = condensed
+    dist_matrix[pair_j, pair_i] = condensed
+    return dist_matrix
+
+
+def compute_ranking_condensed(condensed, pair_i, pair_j, names):
+    """
+    Compute ranking based on mean DTW distance directly from condensed pairs.
+    
+    Equivalent to compute_ranking() without materializing the square matrix.
+    Each entity's mean is taken over all of its pairs; NaN distances are skipped.
+    
+    Args:
+        condensed: 1D array with one distance per pair
+        pair_i, pair_j: Index arrays identifying each pair
+        names: List of entity names (files or columns)
+        
+    Returns:
+        list: List of tuples (name, mean_distance) sorted by distance (descending)
+    """
+    n = len(names)
+    valid = ~np.isnan(condensed)
+    weights = np.where(valid, condensed, 0.0)
+    row_sums = np.bincount(pair_i, weights, n) + np.bincount(pair_j, weights, n)
+    counts = np.bincount(pair_i, valid, n) + np.bincount(pair_j, valid, n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_distances = row_sums / counts
+    # Stable argsort keeps NaN means (every pair failed) at the end
+    order = np.argsort(-mean_distances, kind='stable')
+    ranking = [(names[i], mean_distances[i]) for i in order]
     return ranking
 
 
@@ -118,21 +214,21 @@ def plot_divergence_analysis(df, col1, col2, path, divergence_scores, divergence
     """
     fig, axes = plt.subplots(3, 1, figsize=(14, 10), sharex=True)
     
-    # Map path indices back to time indices
-    time_indices_col1 = [path[i][0] for i in range(len(path))]
-    time_indices_col2 = [path[i][1] for i in range(len(path))]
+    # Map path steps back to timestamps in one take over the index
+    path = np.asarray(path, dtype=np.int64).reshape(-1, 2)
+    aligned_times = df.index[path[:, 0]]
+    last_step = len(path) - 1
+    period_starts = aligned_times[[start for start, _, _ in divergence_periods]]
+    period_ends = aligned_times[[min(end, last_step) for _, end, _ in divergence_periods]]
     
     # Plot 1: Original series with divergence regions highlighted
     ax1 = axes[0]
-    ax1.plot(df.index, df[col1], label=col1, alpha=0.7, linewidth=2)
-    ax1.plot(df.index, df[col2], label=col2, alpha=0.7, linewidth=2)
+    ax1.plot(*_downsample(df.index, df[col1]), label=col1, alpha=0.7, linewidth=2)
+    ax1.plot(*_downsample(df.index, df[col2]), label=col2, alpha=0.7, linewidth=2)
     
     # Highlight divergence periods
     legend_added = {'high': False, 'moderate': False}
-    for start, end, severity in divergence_periods:
-        start_time = df.index[time_indices_col1[start]]
-        end_time = df.index[time_indices_col1[min(end, len(time_indices_col1)-1)]]
-        
+    for (_, _, severity), start_time, end_time in zip(divergence_periods, period_starts, period_ends):
         if severity > 1.5:
             color = 'red'
             label = f'High Divergence (>{1.5:.1f}x threshold)' if not legend_added['high'] else ''
@@ -152,10 +248,10 @@ def plot_divergence_analysis(df, col1, col2, path, divergence_scores, divergence
     
     # Plot 2: Local divergence score over time
     ax2 = axes[1]
-    aligned_times = [df.index[idx] for idx in time_indices_col1]
-    ax2.plot(aligned_times, divergence_scores, color='purple', linewidth=2, label='Local Divergence Score')
+    score_times, scores = _downsample(aligned_times, divergence_scores)
+    ax2.plot(score_times, scores, color='purple', linewidth=2, label='Local Divergence Score')
     ax2.axhline(threshold, color='red', linestyle='--', linewidth=2, label=f'Threshold ({threshold:.3f})')
-    ax2.fill_between(aligned_times, 0, divergence_scores, where=(divergence_scores > threshold), 
+    ax2.fill_between(score_times, 0, scores, where=(scores > threshold), 
                      color='red', alpha=0.3, label='High Divergence Regions')
     ax2.set_ylabel('Divergence Score', fontsize=11, fontweight='bold')
     ax2.set_title('Local DTW Divergence Over Time', fontsize=13, fontweight='bold')
@@ -164,11 +260,11 @@ def plot_divergence_analysis(df, col1, col2, path, divergence_scores, divergence
     
     # Plot 3: Difference between series
     ax3 = axes[2]
-    diff = df[col1].values - df[col2].values
-    ax3.plot(df.index, diff, color='green', linewidth=1.5, label='Difference (Col1 - Col2)')
+    diff_times, diff = _downsample(df.index, df[col1].values - df[col2].values)
+    ax3.plot(diff_times, diff, color='green', linewidth=1.5, label='Difference (Col1 - Col2)')
     ax3.axhline(0, color='black', linestyle='-', linewidth=0.5)
-    ax3.fill_between(df.index, 0, diff, where=(diff > 0), color='green', alpha=0.3, label='Col1 > Col2')
-    ax3.fill_between(df.index, 0, diff, where=(diff < 0), color='red', alpha=0.3, label='Col1 < Col2')
+    ax3.fill_between(diff_times, 0, diff, where=(diff > 0), color='green', alpha=0.3, label='Col1 > Col2')
+    ax3.fill_between(diff_times, 0, diff, where=(diff < 0), color='red', alpha=0.3, label='Col1 < Col2')
     ax3.set_xlabel('Time', fontsize=11, fontweight='bold')
     ax3.set_ylabel('Raw Difference', fontsize=11, fontweight='bold')
     ax3.set_title('Raw Difference Between Series', fontsize=13, fontweight='bold')